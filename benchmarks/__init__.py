@@ -0,0 +1,5 @@
+# ==============================================================================
+# FILE: benchmarks/__init__.py
+# Benchmarks for the financial reporter pipeline. Run them from the
+# repository root, e.g. `python -m benchmarks.startup`.
+# ==============================================================================
@@ -0,0 +1,107 @@
+# ==============================================================================
+# FILE: benchmarks/readers.py
+# Times Agent 1's intake of each upload with every installed spreadsheet
+# reader backend that handles its format (see spreadsheet_readers.py), and
+# checks that all backends extract the same rows.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.readers                            # synthetic 10k-row .xlsx
+#   python -m benchmarks.readers uploads/*.xlsx uploads/*.xls uploads/*.ods
+#   python -m benchmarks.readers --rows 10000 100000 --output readers.json
+# ==============================================================================
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from .run import environment, measure, print_table, workbook_for
+from .synthetic import SyntheticSpec
+
+
+def upload_backends(path):
+    """The upload's format and the installed backends that read it, fastest expected first."""
+    from financial_reporter_app.agents.agent_1_intake import is_delimited_text
+    from financial_reporter_app.spreadsheet_readers import FORMAT_BACKENDS, detect_format, is_installed
+
+    file_format = detect_format(path)
+    if file_format is None:
+        return ('delimited', ['pyarrow.csv']) if is_delimited_text(path) else (None, [])
+    return file_format, [name for name in FORMAT_BACKENDS[file_format] if is_installed(name)]
+
+
+def count_rows(path, backend):
+    """Worksheet rows read from the upload (every sheet), the basis of rows/s."""
+    import pandas as pd
+
+    if backend == 'pyarrow.csv':
+        with open(path, 'rb') as f:
+            return sum(1 for _ in f)
+    xls = pd.ExcelFile(path, engine=backend)
+    return sum(len(pd.read_excel(xls, sheet_name=sheet_name, header=None)) for sheet_name in xls.sheet_names)
+
+
+def bench_upload(path, repeat=3, memory=True):
+    """One record per backend for `path`, plus a list of backends whose rows differ from the first one's."""
+    from financial_reporter_app.agents.agent_1_intake import read_contextual_rows, read_delimited_rows
+
+    file_format, backends = upload_backends(path)
+    if not backends:
+        print(f"⚠️  {path}: no installed reader handles this file ({file_format or 'unknown format'}).")
+        return [], []
+
+    rows = count_rows(path, backends[0])
+    records, mismatches, reference = [], [], None
+    for backend in backends:
+        if backend == 'pyarrow.csv':
+            (intake_df, _), stats = measure(read_delimited_rows, path, repeat=repeat, memory=memory)
+        else:
+            (intake_df, _), stats = measure(read_contextual_rows, path, 0, backend, repeat=repeat, memory=memory)
+        if reference is None:
+            reference = intake_df
+        elif intake_df is None or not intake_df.equals(reference):
+            mismatches.append(f"{os.path.basename(path)}: '{backend}' extracted different rows than '{backends[0]}'")
+        record = {'case': os.path.basename(path), 'stage': backend, 'path': path, 'format': file_format,
+                  'rows': rows, 'repeat': repeat}
+        record.update(stats)
+        record['rows_per_s'] = round(rows / record['median_s'], 1) if record['median_s'] else None
+        records.append(record)
+    return records, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the spreadsheet reader backends' intake throughput.")
+    parser.add_argument('uploads', nargs='*', help="Workbooks (or CSV/TSV exports) to read (default: a synthetic .xlsx).")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000], help="Rows of the synthetic workbooks used without uploads (default: 10000).")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per backend (default: 3).")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc run per backend.")
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'financial_reporter_bench'),
+                        help="Where generated workbooks are kept between runs.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    uploads = args.uploads or [workbook_for(SyntheticSpec(rows), args.work_dir) for rows in args.rows]
+    print(f"\n--- Reader benchmarks: {len(uploads)} upload(s), {args.repeat} runs per backend... ---")
+    records, mismatches = [], []
+    for path in uploads:
+        upload_records, upload_mismatches = bench_upload(path, args.repeat, memory=not args.no_memory)
+        records.extend(upload_records)
+        mismatches.extend(upload_mismatches)
+    print_table(records)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': records}, f, indent=2)
+        print(f"   Results: {args.output}")
+
+    if mismatches:
+        print(f"❌ Reader benchmarks FAILED: {len(mismatches)} backend(s) disagree:")
+        for message in mismatches:
+            print(f"   {message}")
+        return 1
+    print("✅ Reader benchmarks PASSED: every backend extracted the same rows.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+# ==============================================================================
+# FILE: benchmarks/run.py
+# Times each agent and the full pipeline on synthetic trial balances, writes
+# the results as JSON and compares them with a stored baseline.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.run                                # 1k and 10k rows
+#   python -m benchmarks.run --rows 1000 10000 100000 1000000 --sheets 4
+#   FINREPORT_MAX_PERIODS=5 python -m benchmarks.run --periods 5
+#   python -m benchmarks.run --output results.json --baseline benchmarks/baseline.json
+#   python -m benchmarks.run --save-baseline benchmarks/baseline.json
+# ==============================================================================
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Benchmarks measure the pipeline itself: no result cache, no confirmed
+# mappings and no instrumentation records. Settings are read on import.
+os.environ['FINREPORT_CACHE_DIR'] = ''
+os.environ['FINREPORT_MAPPING_STORE'] = ''
+os.environ['FINREPORT_METRICS'] = ''
+
+from .synthetic import SyntheticSpec, generate_workbook
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_ROWS = [1_000, 10_000]
+STAGES = ['intake', 'mapping', 'aggregation', 'validation', 'report', 'pipeline']
+
+# A stage regresses when its median time (or peak memory) grows by more than
+# this share of the baseline, and by more than the noise floor.
+DEFAULT_TOLERANCE = 0.25
+NOISE_FLOOR_S = 0.005
+NOISE_FLOOR_BYTES = 1024 * 1024
+
+
+def _quiet(func, *args):
+    # The agents print progress banners; keep them out of the benchmark output.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+def measure(func, *args, repeat=3, memory=True):
+    """
+    Calls func(*args) once untimed, so lazy imports and first-use caches are
+    not measured, then `repeat` times. Returns (result, stats): the median and
+    minimum wall time in seconds, plus the peak traced memory in bytes of one
+    extra run under tracemalloc (None with memory=False).
+    """
+    result, times = _quiet(func, *args), []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = _quiet(func, *args)
+        times.append(time.perf_counter() - started)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            _quiet(func, *args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, {'median_s': statistics.median(times), 'min_s': min(times), 'peak_mem_bytes': peak}
+
+
+def workbook_for(spec, work_dir):
+    """The path of the synthetic workbook for `spec`, generating it on first use."""
+    os.makedirs(work_dir, exist_ok=True)
+    path = os.path.join(work_dir, f"tb-{spec.rows}-{spec.key()}.xlsx")
+    if not os.path.exists(path):
+        print(f"   Generating {spec.rows} rows -> {path}")
+        generate_workbook(path, spec)
+    return path
+
+
+def bench_case(spec, work_dir, repeat=3, memory=True):
+    """Benchmarks every stage and the full pipeline on one synthetic workbook; returns one record per stage."""
+    from financial_reporter_app.agents.agent_1_intake import intelligent_data_intake_agent
+    from financial_reporter_app.agents.agent_2_ai_mapping import ai_mapping_agent
+    from financial_reporter_app.agents.agent_3_aggregator import hierarchical_aggregator_agent
+    from financial_reporter_app.agents.agent_4_validator import data_validation_agent
+    from financial_reporter_app.agents.agent_5_reporter import report_finalizer_agent
+    from financial_reporter_app.config_snapshot import get_config_snapshot
+    from financial_reporter_app.pipeline import run_pipeline, warm_up
+
+    path = workbook_for(spec, work_dir)
+    _quiet(warm_up)
+    notes_structure = get_config_snapshot().notes_structure
+
+    stats = {}
+    (intake_df, _), stats['intake'] = measure(intelligent_data_intake_agent, path, repeat=repeat, memory=memory)
+    particulars = intake_df['Particulars'].tolist()
+    mapping, stats['mapping'] = measure(ai_mapping_agent, particulars, notes_structure, repeat=repeat, memory=memory)
+    aggregated_data, stats['aggregation'] = measure(hierarchical_aggregator_agent, intake_df, mapping, repeat=repeat, memory=memory)
+    _, stats['validation'] = measure(data_validation_agent, aggregated_data, repeat=repeat, memory=memory)
+    _, stats['report'] = measure(report_finalizer_agent, aggregated_data, 'Benchmark Co.', repeat=repeat, memory=memory)
+    _, stats['pipeline'] = measure(run_pipeline, path, 'Benchmark Co.', repeat=repeat, memory=memory)
+
+    records = []
+    for stage in STAGES:
+        rows = spec.rows if stage in ('intake', 'pipeline') else len(intake_df)
+        record = {'case': f"rows={spec.rows}", 'stage': stage, 'spec': spec.to_dict(), 'rows': rows, 'repeat': repeat}
+        record.update(stats[stage])
+        record['rows_per_s'] = round(rows / record['median_s'], 1) if record['median_s'] else None
+        records.append(record)
+    return records
+
+
+def bench_startup(runs=5):
+    """The cold-start import time, as a 'startup' record (see benchmarks/startup.py)."""
+    from .startup import check_startup
+
+    result = check_startup(runs=runs)
+    return {'case': 'startup', 'stage': 'startup', 'rows': None, 'repeat': runs,
+            'median_s': result['median_ms'] / 1000, 'min_s': min(result['runs_ms']) / 1000,
+            'peak_mem_bytes': None, 'rows_per_s': None, 'eager_heavy_imports': result['eager_heavy_imports']}
+
+
+def environment():
+    """Where the results were measured, stored with them for context."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'python': sys.version.split()[0], 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'commit': commit, 'measured_at': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def compare_to_baseline(records, baseline_records, tolerance=DEFAULT_TOLERANCE):
+    """
+    Returns a list of regression messages: stages whose median time or peak
+    memory grew by more than `tolerance` (and the noise floor) over the
+    baseline record with the same case and stage.
+    """
+    baseline = {(record['case'], record['stage']): record for record in baseline_records}
+    regressions = []
+    for record in records:
+        base = baseline.get((record['case'], record['stage']))
+        if base is None:
+            continue
+        for field, floor, unit in (('median_s', NOISE_FLOOR_S, 's'), ('peak_mem_bytes', NOISE_FLOOR_BYTES, 'B')):
+            new, old = record.get(field), base.get(field)
+            if new is None or old is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > floor:
+                regressions.append(f"{record['case']} {record['stage']}: {field} {old:,.4g}{unit} -> {new:,.4g}{unit} "
+                                   f"(+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
+
+
+def print_table(records):
+    width = max([14] + [len(record['case']) + 2 for record in records])
+    print(f"\n{'case':<{width}}{'stage':<13}{'median s':>11}{'min s':>11}{'peak MB':>10}{'rows/s':>13}")
+    for record in records:
+        peak = record['peak_mem_bytes']
+        print(f"{record['case']:<{width}}{record['stage']:<13}{record['median_s']:>11.4f}{record['min_s']:>11.4f}"
+              f"{(peak / 1e6 if peak is not None else float('nan')):>10.2f}"
+              f"{(record['rows_per_s'] or 0):>13,.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the five agents and the full pipeline on synthetic trial balances.")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help="Ledger row counts to benchmark (default: 1000 10000).")
+    parser.add_argument('--sheets', type=int, default=1, help="Sheets per workbook (default: 1).")
+    parser.add_argument('--extra-columns', type=int, default=1, help="Ledger-code columns left of Particulars (default: 1).")
+    parser.add_argument('--header-density', type=float, default=0.08, help="Share of section-heading rows (default: 0.08).")
+    parser.add_argument('--periods', type=int, default=2, help="Amount columns per ledger line, current year first (default: 2).")
+    parser.add_argument('--no-py', action='store_true', help="Workbooks without a previous-year column (same as --periods 1).")
+    parser.add_argument('--unmatched-ratio', type=float, default=0.1, help="Share of particulars matching no alias (default: 0.1).")
+    parser.add_argument('--seed', type=int, default=7, help="Generator seed (default: 7).")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage (default: 3).")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc run per stage.")
+    parser.add_argument('--startup', action='store_true', help="Also record the cold-start import time.")
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'financial_reporter_bench'),
+                        help="Where generated workbooks are kept between runs.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help=f"Compare with this results file, e.g. {os.path.relpath(DEFAULT_BASELINE, REPO_ROOT)}.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help=f"Allowed slowdown before a regression is reported (default: {DEFAULT_TOLERANCE}).")
+    parser.add_argument('--save-baseline', help="Write the results as the new baseline to this file.")
+    args = parser.parse_args(argv)
+
+    print(f"\n--- Benchmarks: {len(args.rows)} workbook size(s), {args.repeat} runs per stage... ---")
+    records = []
+    if args.startup:
+        records.append(bench_startup())
+    for rows in args.rows:
+        spec = SyntheticSpec(rows, args.sheets, args.extra_columns, args.header_density, 1 if args.no_py else args.periods,
+                             args.unmatched_ratio, args.seed)
+        records.extend(bench_case(spec, args.work_dir, args.repeat, memory=not args.no_memory))
+    print_table(records)
+
+    results = {'environment': environment(), 'results': records}
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"   Results: {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(records, baseline['results'], args.tolerance)
+        if regressions:
+            print(f"❌ Benchmarks FAILED: {len(regressions)} regression(s) against {args.baseline}:")
+            for message in regressions:
+                print(f"   {message}")
+            return 1
+        print(f"✅ Benchmarks PASSED: no regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
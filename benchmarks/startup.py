@@ -0,0 +1,101 @@
+# ==============================================================================
+# FILE: benchmarks/startup.py
+# Cold-start budget check based on `python -X importtime`: importing the
+# pipeline must stay under a time budget and must not pull in heavy modules
+# that the stages import lazily.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.startup
+#   python -m benchmarks.startup --budget-ms 300 --runs 7 --json startup.json
+# ==============================================================================
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_MODULE = 'financial_reporter_app.pipeline'
+STARTUP_BUDGET_MS = 400
+
+# Modules that only the stages that need them may import.
+LAZY_MODULES = ('pandas', 'xlsxwriter', 'openpyxl', 'scipy', 'pyarrow', 'config')
+
+
+def parse_importtime(stderr):
+    """Parses `-X importtime` output into (module, self_us, cumulative_us) tuples, in import order."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure_import(module=STARTUP_MODULE):
+    """Imports `module` in a fresh interpreter and returns its parsed importtime records."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+
+def check_startup(module=STARTUP_MODULE, budget_ms=STARTUP_BUDGET_MS, runs=5):
+    """
+    Imports `module` `runs` times and returns a result dict: the median and
+    per-run cumulative import time in ms, the slowest imports (by self time) of
+    the median run, any LAZY_MODULES that were imported eagerly, and whether
+    the check passed.
+    """
+    samples = []
+    for _ in range(runs):
+        imports = measure_import(module)
+        total_us = next(cumulative for name, _, cumulative in imports if name == module)
+        samples.append((total_us, imports))
+    samples.sort(key=lambda sample: sample[0])
+    median_us, median_imports = samples[len(samples) // 2]
+
+    loaded = {name for name, _, _ in median_imports}
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    slowest = sorted(median_imports, key=lambda record: record[1], reverse=True)[:10]
+    return {
+        'module': module,
+        'python': sys.version.split()[0],
+        'budget_ms': budget_ms,
+        'median_ms': round(median_us / 1000, 2),
+        'runs_ms': [round(total_us / 1000, 2) for total_us, _ in samples],
+        'slowest_imports': [{'module': name, 'self_ms': round(self_us / 1000, 2)} for name, self_us, _ in slowest],
+        'eager_heavy_imports': eager,
+        'passed': median_us / 1000 <= budget_ms and not eager
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the pipeline's cold-start import time against a budget.")
+    parser.add_argument('--module', default=STARTUP_MODULE, help=f"Module to import (default: {STARTUP_MODULE}).")
+    parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS, help=f"Median import time budget (default: {STARTUP_BUDGET_MS}).")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters to measure (default: 5).")
+    parser.add_argument('--json', help="Also write the result to this JSON file.")
+    args = parser.parse_args(argv)
+
+    result = check_startup(args.module, args.budget_ms, args.runs)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+    print(f"\n--- Startup: import {result['module']} ---")
+    print(f"   Median {result['median_ms']:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    for record in result['slowest_imports'][:5]:
+        print(f"   {record['self_ms']:8.1f} ms  {record['module']}")
+    if result['eager_heavy_imports']:
+        print(f"❌ Startup FAILED: imported eagerly: {', '.join(result['eager_heavy_imports'])}")
+    elif not result['passed']:
+        print("❌ Startup FAILED: over budget.")
+    else:
+        print("✅ Startup PASSED.")
+    return 0 if result['passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# ==============================================================================
+# FILE: benchmarks/synthetic.py
+# Builds realistic, reproducible trial-balance workbooks from the aliases in
+# NOTES_STRUCTURE_AND_MAPPING, for benchmarking the pipeline.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.synthetic tb_10k.xlsx --rows 10000
+#   python -m benchmarks.synthetic tb_1m.xlsx --rows 1000000 --sheets 4 --no-py
+#   python -m benchmarks.synthetic tb_5y.xlsx --rows 10000 --periods 5
+# ==============================================================================
+import argparse
+import hashlib
+import json
+import random
+import sys
+
+SECTION_HEADINGS = [
+    'Current Liabilities', 'Non-Current Liabilities', 'Current Assets', 'Fixed Assets', 'Investments',
+    "Shareholder's Funds", 'Loans and Advances', 'Direct Expenses', 'Indirect Expenses', 'Other Income',
+    'Duties and Taxes', 'Sundry Debtors', 'Sundry Creditors', 'Bank Accounts', 'Provisions'
+]
+NOISE_WORDS = [
+    'suspense', 'adjustment', 'clearing', 'round off', 'inter unit', 'memo', 'transit', 'staff welfare club',
+    'branch', 'project', 'imprest', 'difference', 'unreconciled', 'temporary', 'carry forward'
+]
+
+
+class SyntheticSpec:
+    """
+    Shape of a synthetic trial balance:
+      - `rows`: data rows in total, split evenly across `sheets`;
+      - `extra_columns`: ledger-code columns to the left of Particulars;
+      - `header_density`: share of rows that are text-only section headings;
+      - `periods`: amount columns per ledger line, current year first (1
+        leaves out the previous year; 5 gives four years of comparatives);
+      - `unmatched_ratio`: share of particulars that match no config alias;
+      - `seed`: the random seed, so the same spec always builds the same file.
+    """
+
+    def __init__(self, rows=10_000, sheets=1, extra_columns=1, header_density=0.08, periods=2,
+                 unmatched_ratio=0.1, seed=7):
+        self.rows = rows
+        self.sheets = sheets
+        self.extra_columns = extra_columns
+        self.header_density = header_density
+        self.periods = periods
+        self.unmatched_ratio = unmatched_ratio
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def key(self):
+        """A short, stable id of the spec, e.g. for naming cached workbooks."""
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def config_aliases():
+    """Every alias in NOTES_STRUCTURE_AND_MAPPING, with its original spelling, in template order."""
+    from financial_reporter_app.config_snapshot import get_config_snapshot
+
+    aliases = []
+    def walk(node):
+        for value in node.values():
+            if isinstance(value, dict):
+                walk(value)
+            else:
+                aliases.extend(value if isinstance(value, (list, tuple)) else [value])
+    for note_data in get_config_snapshot().notes_structure.values():
+        walk(note_data.get('sub_items', {}))
+    return aliases
+
+
+def _amount(rng):
+    """A ledger amount: mostly paise-precision figures, some whole rupees and some blanks."""
+    r = rng.random()
+    if r < 0.75:
+        return round(rng.uniform(-5e5, 5e6), 2)
+    if r < 0.95:
+        return rng.randint(0, 100_000)
+    return None
+
+
+def _sheet_rows(rng, spec, aliases, n_rows):
+    """Yields the rows of one sheet: title lines, a column header, then the ledger lines."""
+    lead = [None] * spec.extra_columns
+    amount_headers = ['Current Year', 'Previous Year', *(f"Year -{period}" for period in range(2, spec.periods))][:spec.periods]
+    yield ['Synthetic Trading Co. Ltd.']
+    yield ['Trial Balance as at 31 March 2025']
+    yield []
+    yield ['Ledger Code'] * spec.extra_columns + ['Particulars'] + amount_headers
+
+    written = 0
+    while written < n_rows:
+        r = rng.random()
+        if r < spec.header_density:
+            row = lead + [rng.choice(SECTION_HEADINGS)]
+        elif r < spec.header_density + spec.unmatched_ratio:
+            particular = f"{rng.choice(NOISE_WORDS).title()} {rng.choice(NOISE_WORDS)} {rng.randint(1, 999)}"
+            row = [f"L-{rng.randint(1000, 9999)}"] * spec.extra_columns + [particular, _amount(rng)]
+        else:
+            alias = rng.choice(aliases)
+            if '|' in alias:
+                # Contextual aliases appear as a heading row followed by the particular.
+                heading, alias = alias.rsplit('|', 1)
+                yield lead + [heading.split('|')[-1]]
+                written += 1
+                if written >= n_rows:
+                    break
+            if rng.random() < 0.1:
+                alias = f"  {alias.upper()} "
+            row = [f"L-{rng.randint(1000, 9999)}"] * spec.extra_columns + [alias, _amount(rng)]
+        if len(row) > spec.extra_columns + 1:
+            row.extend(_amount(rng) for _ in range(spec.periods - 1))
+        yield row
+        written += 1
+
+
+def generate_workbook(path, spec):
+    """
+    Writes the workbook for `spec` to `path` with xlsxwriter in constant-memory
+    mode, so even 1M-row files are built row by row. Returns the number of
+    ledger rows written.
+    """
+    import xlsxwriter
+
+    rng = random.Random(spec.seed)
+    aliases = config_aliases()
+    per_sheet = [spec.rows // spec.sheets + (1 if i < spec.rows % spec.sheets else 0) for i in range(spec.sheets)]
+    with xlsxwriter.Workbook(path, {'constant_memory': True}) as workbook:
+        for sheet_index, n_rows in enumerate(per_sheet):
+            worksheet = workbook.add_worksheet(f"TB {sheet_index + 1}")
+            for row_num, row in enumerate(_sheet_rows(rng, spec, aliases, n_rows)):
+                worksheet.write_row(row_num, 0, row)
+    return spec.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic trial-balance workbook.")
+    parser.add_argument('output', help="Path of the .xlsx file to write.")
+    parser.add_argument('--rows', type=int, default=10_000, help="Ledger rows in total (default: 10000).")
+    parser.add_argument('--sheets', type=int, default=1, help="Sheets to spread the rows over (default: 1).")
+    parser.add_argument('--extra-columns', type=int, default=1, help="Ledger-code columns left of Particulars (default: 1).")
+    parser.add_argument('--header-density', type=float, default=0.08, help="Share of section-heading rows (default: 0.08).")
+    parser.add_argument('--periods', type=int, default=2, help="Amount columns, current year first (default: 2).")
+    parser.add_argument('--no-py', action='store_true', help="Leave out the previous-year column (same as --periods 1).")
+    parser.add_argument('--unmatched-ratio', type=float, default=0.1, help="Share of particulars matching no alias (default: 0.1).")
+    parser.add_argument('--seed', type=int, default=7, help="Random seed (default: 7).")
+    args = parser.parse_args(argv)
+
+    spec = SyntheticSpec(args.rows, args.sheets, args.extra_columns, args.header_density, 1 if args.no_py else args.periods,
+                         args.unmatched_ratio, args.seed)
+    generate_workbook(args.output, spec)
+    print(f"✅ Wrote {spec.rows} rows over {spec.sheets} sheet(s) to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,82 +2,481 @@
 # FILE: agents/agent_1_intake.py (DEFINITIVE, MODIFIED FOR PY-AWARENESS)
 # This version is required to work with the master config.py file.
 # ==============================================================================
-import pandas as pd
+import itertools
+import os
 import io # Imported for type hinting if needed, good practice
+from ..instrumentation import annotate, instrument_stage
+from ..periods import MIN_PERIODS, amount_columns
+from ..settings import INTAKE_WORKERS, MAX_PERIODS
+from ..spreadsheet_readers import detect_format, read_head, read_with_fallback, upload_name
 
-def intelligent_data_intake_agent(file_object):
+# In streaming mode, the Particulars/amount columns of a sheet are detected from
+# this many leading rows; the rest of the sheet is never held in memory.
+STREAMING_SAMPLE_ROWS = 500
+
+# The intake DataFrame: the contextual key and its amount per period (see
+# periods.py), then where the row came from (sheet name and 1-based worksheet
+# row). Rows are de-duplicated on the value columns only, so the first
+# occurrence's location is kept.
+def intake_value_columns(n_periods):
+    return ['Particulars'] + amount_columns(n_periods)
+
+def intake_columns(n_periods):
+    return intake_value_columns(n_periods) + ['Sheet', 'Row']
+
+# The missing-value markers pd.read_excel applies by default, plus Excel error
+# codes, so streamed cells are dropped exactly like the DataFrame path drops them.
+_NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+    '#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!'
+])
+
+def profile_columns(df):
     """
-    AGENT 1: Reads Excel, intelligently finds financial data sections, creates
-    contextual keys, AND NOW ALSO RETURNS A FLAG INDICATING IF PREVIOUS YEAR
-    DATA WAS FOUND.
+    Classifies every column of a sheet once, so the block search below never
+    re-parses a column. Returns, per column, the number of text cells, the
+    number of numeric cells, and the column coerced to numbers (NaN where a
+    cell is not numeric).
     """
-    print("\n--- Agent 1 (Data Intake): Reading, parsing, and adding context... ---")
+    import pandas as pd
+    text_counts, numeric_counts, numeric_cols = [], [], []
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i]
+        if pd.api.types.is_numeric_dtype(col.dtype) or pd.api.types.is_datetime64_any_dtype(col.dtype):
+            # Typed columns can't hold text, and numeric ones are already parsed.
+            text_counts.append(0)
+        elif pd.api.types.is_string_dtype(col.dtype) and col.dtype != object:
+            text_counts.append(int(col.notna().sum()))
+        else:
+            text_counts.append(int(col.map(type).eq(str).sum()))
+        numeric_col = pd.to_numeric(col, errors='coerce')
+        numeric_counts.append(int(numeric_col.notna().sum()))
+        numeric_cols.append(numeric_col)
+    return text_counts, numeric_counts, numeric_cols
+
+def find_data_blocks(text_counts, numeric_counts, max_periods=MAX_PERIODS):
+    """
+    Picks the Particulars/CY[/PY/PY2...] blocks out of a column profile: a
+    text column followed by up to `max_periods` numeric columns. Returns a
+    (particulars_column, periods) pair for each block, left to right.
+    """
+    blocks = []
+    n_cols = len(text_counts)
+    for i in range(n_cols - 1):
+        is_text_col = text_counts[i] > 5
+        is_num_col = numeric_counts[i + 1] > 3
+        if is_text_col and is_num_col:
+            periods = 1
+            while periods < max_periods and i + 1 + periods < n_cols and numeric_counts[i + 1 + periods] > 3:
+                periods += 1
+            blocks.append((i, periods))
+    return blocks
+
+def extract_contextual_frames(df, found_periods, profile=None, sheet_name=None, max_periods=MAX_PERIODS):
+    """
+    Extracts the contextual rows of every data block in one sheet. Returns a
+    list of DataFrames (one per non-empty block) and the updated number of
+    periods found so far (`found_periods` comes in from earlier sheets; 0 for
+    the first). `profile` may pass in an already computed profile_columns(df);
+    rows are tagged with `sheet_name` and their worksheet row number.
+    """
+    import pandas as pd
+    frames = []
+    text_counts, numeric_counts, numeric_cols = profile or profile_columns(df)
+    for i, periods in find_data_blocks(text_counts, numeric_counts, max_periods):
+        # ================== CHANGE 2: UPDATE THE FLAG ==================
+        # Every block is read for as many periods as the widest block so far;
+        # the periods a block has no column for are 0.
+        found_periods = max(found_periods, periods)
+        # ===============================================================
+        found_columns = amount_columns(found_periods)
+        temp_df = pd.DataFrame({'Particulars': df.iloc[:, i], **{
+            column: numeric_cols[i + 1 + period] if period < periods else 0 for period, column in enumerate(found_columns)}})
+
+        temp_df.dropna(subset=['Particulars'], inplace=True)
+
+        # The block is processed column-wise rather than row by row.
+        particulars = temp_df['Particulars'].map(str).str.strip()
+        has_total = particulars.str.lower().str.contains('total', regex=False)
+
+        # A row is a header if it has text but NO numbers. This is the key logic.
+        is_header = temp_df[found_columns].isna().all(axis=1)
+        header_rows = is_header & ~has_total
+
+        # Every row carries the most recent header above it (forward-fill).
+        current_header = particulars.where(header_rows).ffill().fillna('')
+        keep = ~header_rows & (particulars != '') & ~has_total
+        if not keep.any():
+            continue
+
+        contextual_key = (current_header + '|' + particulars).where(current_header != '', particulars)
+        frames.append(pd.DataFrame({
+            'Particulars': contextual_key[keep],
+            **{column: temp_df[column][keep].fillna(0) if column in temp_df else 0
+               for column in amount_columns(max(found_periods, MIN_PERIODS))},
+            'Sheet': sheet_name,
+            'Row': contextual_key.index[keep] + 1 # read_excel(header=None) keeps leading blank rows
+        }))
+    return frames, found_periods
+
+def combine_frames(frames, found_periods):
+    """
+    Concatenates block frames into the intake DataFrame, with one amount
+    column per period found (at least MIN_PERIODS), and drops duplicate rows.
+    Blocks read before a wider one was found get 0 for the extra periods.
+    """
+    import pandas as pd
+    columns = intake_columns(max(found_periods, MIN_PERIODS))
+    frames = [frame if len(frame.columns) == len(columns) else frame.reindex(columns=columns, fill_value=0) for frame in frames]
+    return pd.concat(frames, ignore_index=True).drop_duplicates(subset=columns[:-2])
+
+def _cell_to_number(value):
+    """Scalar twin of pd.to_numeric(errors='coerce') for a raw openpyxl cell value."""
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    if isinstance(value, str) and '_' not in value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return float('nan')
+
+def _cell_to_text(value):
+    """Returns None for an empty cell, else the text pandas would show for it."""
+    if value is None or (isinstance(value, str) and value in _NA_STRINGS):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value) # read_excel reads whole floats back as ints
+    return str(value).strip()
+
+def stream_contextual_rows(file_object, sample_rows=STREAMING_SAMPLE_ROWS, max_periods=MAX_PERIODS):
+    """
+    Streaming twin of the sheet loop, for uploads too large to load as
+    DataFrames. Each sheet is read once in openpyxl read-only mode: the data
+    blocks are detected from the first `sample_rows` rows, and every row is
+    turned into contextual records as it arrives. Duplicates are dropped on the
+    fly, so only the distinct output records are kept in memory. Returns the
+    final DataFrame (None if nothing was found) and the PY flag.
+    """
+    import pandas as pd
+    import openpyxl
+
+    # Records carry an amount for every period a block could have; the
+    # periods no block had are all 0 and are dropped at the end.
+    record_periods = max(max_periods, MIN_PERIODS)
+    workbook = openpyxl.load_workbook(file_object, read_only=True, data_only=True)
+    records, index, seen = [], [], set()
+    position = 0 # Row position in the output before de-duplication
+    rows_in = 0
+    found_periods = 0
+    try:
+        for worksheet in workbook.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            sample = list(itertools.islice(rows, sample_rows))
+            sample_df = pd.DataFrame([[None if _cell_to_text(v) is None else v for v in row] for row in sample])
+
+            # Each block remembers the number of periods found as it stood when the
+            # block was found, its current header, and its (first-occurrence)
+            # records for this sheet.
+            blocks = []
+            for i, periods in find_data_blocks(*profile_columns(sample_df)[:2], max_periods):
+                found_periods = max(found_periods, periods)
+                blocks.append({'col': i, 'periods': periods, 'found_periods': found_periods,
+                               'header': '', 'count': 0, 'records': [], 'seen': set()})
+            if not blocks:
+                continue
+
+            for row_number, row in enumerate(itertools.chain(sample, rows), 1):
+                rows_in += 1
+                width = len(row)
+                for block in blocks:
+                    i = block['col']
+                    particular = _cell_to_text(row[i]) if i < width else None
+                    if particular is None:
+                        continue
+                    amounts = [_cell_to_number(row[j]) if j < width else float('nan') for j in range(i + 1, i + 1 + block['periods'])]
+                    amounts += [0] * (block['found_periods'] - block['periods'])
+
+                    # Same header/total rules as extract_contextual_frames().
+                    is_total = 'total' in particular.lower()
+                    is_header = all(amount != amount for amount in amounts)
+                    if is_header and not is_total:
+                        block['header'] = particular
+                        continue
+                    if not particular or is_total:
+                        continue
+
+                    record = (
+                        f"{block['header']}|{particular}" if block['header'] else particular,
+                        *[amount if amount == amount else 0 for amount in amounts],
+                        *[0] * (record_periods - len(amounts))
+                    )
+                    if record not in block['seen']:
+                        block['seen'].add(record)
+                        block['records'].append((block['count'], record, row_number))
+                    block['count'] += 1
+
+            # Blocks are emitted left to right, as the DataFrame path does.
+            for block in blocks:
+                for offset, record, row_number in block['records']:
+                    if record not in seen:
+                        seen.add(record)
+                        records.append(record + (worksheet.title, row_number))
+                        index.append(position + offset)
+                position += block['count']
+    finally:
+        workbook.close()
+    annotate(sheets=len(workbook.sheetnames), rows_in=rows_in)
+
+    if not records:
+        return None, found_periods > 1
+    final_df = pd.DataFrame.from_records(records, columns=intake_columns(record_periods), index=index)
+    if record_periods > max(found_periods, MIN_PERIODS):
+        final_df = final_df[intake_columns(max(found_periods, MIN_PERIODS))]
+    return final_df, found_periods > 1
+
+# Delimited-text exports (CSV/TSV) are read by read_delimited_rows() instead
+# of the Excel readers. The delimiter of .csv/.txt files is sniffed.
+DELIMITED_EXTENSIONS = {'.csv': None, '.txt': None, '.tsv': '\t', '.tab': '\t'}
+_SNIFF_BYTES = 64 * 1024
+
+# A number the way a spreadsheet writes it into a text export: an optional
+# sign or accounting parentheses, and Western (1,234,567) or Indian
+# (12,34,567) digit grouping. Such cells are typed as numbers, as they were
+# in the spreadsheet. (RE2 syntax, evaluated by pyarrow.)
+_NUMBER_TEXT = r'^\s*\(?\s*-?\s*(\d{1,3}(,\d{2})*,\d{3}|\d{1,3}(,\d{3})+|\d+)?(\.\d+)?\s*\)?\s*$'
+
+def is_delimited_text(file_object):
+    """True if the upload (a path, or a file object with a name) is a CSV/TSV export."""
+    return os.path.splitext(upload_name(file_object))[1].lower() in DELIMITED_EXTENSIONS
+
+def sniff_delimiter(file_object):
+    """The delimiter of a delimited-text upload: by extension for TSV, else sniffed from its first 64 KiB."""
+    import csv
+    delimiter = DELIMITED_EXTENSIONS.get(os.path.splitext(upload_name(file_object))[1].lower())
+    if delimiter:
+        return delimiter
+    sample = read_head(file_object, _SNIFF_BYTES).decode('utf-8', errors='replace')
     try:
-        xls = pd.ExcelFile(file_object)
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return ','
+
+def _typed_column(column):
+    """
+    A text column as pandas would hold the same spreadsheet column: cells
+    that hold a number become numbers (whole numbers as ints, as read_excel
+    returns them), the rest stay text. Non-text columns are converted as-is.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    if not pa.types.is_string(column.type) and not pa.types.is_large_string(column.type):
+        return column.to_pandas()
+
+    is_number = pc.and_(pc.match_substring_regex(column, _NUMBER_TEXT), pc.match_substring_regex(column, r'\d'))
+    opens, closes = pc.match_substring_regex(column, r'^\s*\('), pc.match_substring_regex(column, r'\)\s*$')
+    is_number = pc.fill_null(pc.and_(is_number, pc.equal(opens, closes)), False)
+    cells = column.to_pandas().astype(object)
+    if not pc.any(is_number).as_py():
+        return cells
+
+    digits = pc.replace_substring_regex(pc.if_else(is_number, column, None), r'[\s,()]', '')
+    values = pc.cast(digits, pa.float64())
+    values = pc.if_else(pc.fill_null(opens, False), pc.negate(values), values)
+    is_number = is_number.to_numpy(zero_copy_only=False)
+    is_whole = is_number & ~pc.fill_null(pc.match_substring(column, '.'), False).to_numpy(zero_copy_only=False)
+    values = values.to_numpy(zero_copy_only=False)
+    cells[is_number & ~is_whole] = values[is_number & ~is_whole].tolist()
+    cells[is_whole] = values[is_whole].astype(np.int64).tolist()
+    return cells
+
+def _read_delimited_table(file_object, delimiter):
+    """
+    Parses a delimited-text upload into an Arrow table with pyarrow's
+    multi-threaded CSV reader. Ragged files (rows of different widths, e.g. a
+    one-cell title line) and non-UTF-8 files, which it rejects, are read with
+    the csv module instead, padding short rows.
+    """
+    import csv
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    if not isinstance(file_object, (str, os.PathLike)):
+        file_object.seek(0)
+    try:
+        return pa_csv.read_csv(
+            file_object,
+            read_options=pa_csv.ReadOptions(autogenerate_column_names=True, use_threads=True),
+            parse_options=pa_csv.ParseOptions(delimiter=delimiter, ignore_empty_lines=False),
+            convert_options=pa_csv.ConvertOptions(null_values=sorted(_NA_STRINGS), strings_can_be_null=True,
+                                                  quoted_strings_can_be_null=True))
+    except pa.ArrowInvalid:
+        pass
+
+    raw = read_head(file_object, -1)
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = raw.decode('cp1252', errors='replace')
+    rows = list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+    width = max((len(row) for row in rows), default=0)
+    columns = [[None] * len(rows) for _ in range(width)]
+    for row_index, row in enumerate(rows):
+        for col_index, value in enumerate(row):
+            if value not in _NA_STRINGS:
+                columns[col_index][row_index] = value
+    return pa.table({f"f{i}": pa.array(column, type=pa.string()) for i, column in enumerate(columns)})
+
+def read_delimited_rows(file_object, max_periods=MAX_PERIODS):
+    """
+    Delimited-text twin of read_contextual_rows(): the upload is one sheet
+    (named after the file), parsed into the same positional columns
+    read_excel(header=None) produces and run through the same block
+    detection and header-context logic. Returns the final DataFrame (None if
+    nothing was found) and the PY flag.
+    """
+    import pandas as pd
+    table = _read_delimited_table(file_object, sniff_delimiter(file_object))
+    df = pd.DataFrame({i: _typed_column(table.column(i)) for i in range(table.num_columns)})
+    annotate(sheets=1, rows_in=len(df))
+    frames, found_periods = extract_contextual_frames(df, 0, sheet_name=os.path.basename(upload_name(file_object)) or None,
+                                                      max_periods=max_periods)
+    if not frames:
+        return None, found_periods > 1
+    return combine_frames(frames, found_periods), found_periods > 1
+
+# The workbook each pool worker reads its sheets from, opened once per process.
+_worker_workbook = None
+
+def _init_sheet_worker(source, backend):
+    global _worker_workbook
+    import pandas as pd
+    _worker_workbook = pd.ExcelFile(io.BytesIO(source) if isinstance(source, bytes) else source, engine=backend)
+
+def _extract_sheet_in_worker(sheet_name, max_periods=MAX_PERIODS):
+    """
+    Parses one sheet in a pool worker. A sheet's output depends on the number
+    of periods found in earlier sheets, which a worker can't know, so it
+    returns every outcome: a dict of frames by incoming number of periods
+    (key 0 standing for every number that makes no difference), the number
+    of periods found in the sheet, and the sheet's row count.
+    """
+    import pandas as pd
+    df = pd.read_excel(_worker_workbook, sheet_name=sheet_name, header=None)
+    profile = profile_columns(df)
+    frames, found_periods = extract_contextual_frames(df, 0, profile, sheet_name, max_periods)
+
+    # The incoming number only matters when it is wider than the sheet's
+    # first block, for the blocks before the first one at least as wide.
+    blocks = find_data_blocks(*profile[:2], max_periods)
+    outcomes = {0: frames}
+    for incoming in range(blocks[0][1] + 1 if blocks else max_periods + 1, max_periods + 1):
+        outcomes[incoming], _ = extract_contextual_frames(df, incoming, profile, sheet_name, max_periods)
+    return outcomes, found_periods, len(df)
+
+def _extract_sheets_in_parallel(file_object, sheet_names, workers, backend, max_periods=MAX_PERIODS):
+    """
+    Runs _extract_sheet_in_worker over a process pool and merges the results in
+    sheet order, threading the number of periods found through exactly as the
+    sequential loop does.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    if isinstance(file_object, (str, os.PathLike)):
+        source = file_object
+    else:
+        file_object.seek(0)
+        source = file_object.read()
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(sheet_names)),
+                             initializer=_init_sheet_worker, initargs=(source, backend)) as pool:
+        sheet_results = list(pool.map(partial(_extract_sheet_in_worker, max_periods=max_periods), sheet_names))
+
+    all_contextual_rows = []
+    found_periods = 0
+    for outcomes, sheet_found_periods, _ in sheet_results:
+        all_contextual_rows.extend(outcomes.get(found_periods, outcomes[0]))
+        found_periods = max(found_periods, sheet_found_periods)
+    annotate(sheets=len(sheet_results), rows_in=sum(result[2] for result in sheet_results))
+    return all_contextual_rows, found_periods
+
+def _read_sheets(file_object, backend, workers, max_periods=MAX_PERIODS):
+    """Reads every sheet with pandas engine `backend`; returns the contextual row frames and the number of periods found."""
+    import pandas as pd
+    xls = pd.ExcelFile(file_object, engine=backend)
+    if workers > 1 and len(xls.sheet_names) > 1:
+        all_contextual_rows, found_periods = _extract_sheets_in_parallel(file_object, xls.sheet_names, workers, backend, max_periods)
+    else:
         all_contextual_rows = []
-        
+
         # ================== CHANGE 1: ADD A FLAG ==================
-        # This new variable will track if we find a valid PY column anywhere in the file.
-        # It starts as False.
-        found_py_column = False
+        # This new variable tracks how many amount columns (periods) we have
+        # found in any block so far. It starts at 0.
+        found_periods = 0
         # ==========================================================
 
+        rows_in = 0
         for sheet_name in xls.sheet_names:
             df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
-            for i in range(df.shape[1] - 1):
-                col1, col2 = df.iloc[:, i], df.iloc[:, i + 1]
-                is_text_col = col1.apply(lambda x: isinstance(x, str)).sum() > 5
-                is_num_col = pd.to_numeric(col2, errors='coerce').notna().sum() > 3
-
-                if is_text_col and is_num_col:
-                    temp_df = None
-                    
-                    if df.shape[1] > i + 2 and pd.to_numeric(df.iloc[:, i + 2], errors='coerce').notna().sum() > 3:
-                        # ================== CHANGE 2: UPDATE THE FLAG ==================
-                        # If we find a valid third numeric column, we set our flag to True.
-                        found_py_column = True
-                        # ===============================================================
-                        temp_df = df.iloc[:, [i, i + 1, i + 2]].copy()
-                        temp_df.columns = ['Particulars', 'Amount_CY', 'Amount_PY']
-                    else:
-                        temp_df = df.iloc[:, [i, i + 1]].copy()
-                        temp_df.columns = ['Particulars', 'Amount_CY']
-                        temp_df['Amount_PY'] = 0
-                    
-                    temp_df.dropna(subset=['Particulars'], inplace=True)
-                    temp_df['Amount_CY'] = pd.to_numeric(temp_df['Amount_CY'], errors='coerce')
-                    temp_df['Amount_PY'] = pd.to_numeric(temp_df['Amount_PY'], errors='coerce')
-
-                    current_header = ""
-                    for _, row in temp_df.iterrows():
-                        particular = str(row['Particulars']).strip()
-                        
-                        # A row is a header if it has text but NO numbers. This is the key logic.
-                        is_header = pd.isna(row['Amount_CY']) and (pd.isna(row['Amount_PY']) if found_py_column else True)
-
-                        if is_header and 'total' not in particular.lower():
-                            current_header = particular
-                            continue
-                        
-                        if not particular or 'total' in particular.lower():
-                            continue
-
-                        contextual_key = f"{current_header}|{particular}" if current_header else particular
-                        all_contextual_rows.append({
-                            'Particulars': contextual_key,
-                            'Amount_CY': row['Amount_CY'] if pd.notna(row['Amount_CY']) else 0,
-                            'Amount_PY': row['Amount_PY'] if found_py_column and pd.notna(row['Amount_PY']) else 0
-                        })
-        
-        if not all_contextual_rows:
+            frames, found_periods = extract_contextual_frames(df, found_periods, sheet_name=sheet_name, max_periods=max_periods)
+            all_contextual_rows.extend(frames)
+            rows_in += len(df)
+        annotate(sheets=len(xls.sheet_names), rows_in=rows_in)
+    return all_contextual_rows, found_periods
+
+def read_contextual_rows(file_object, workers=0, reader=None, max_periods=MAX_PERIODS):
+    """
+    Loads every sheet as a DataFrame and extracts its contextual rows, using
+    `workers` processes when it is above 1. The workbook is read with the
+    first backend of its format's chain that succeeds, or with `reader` when
+    given (see spreadsheet_readers.py). Returns the final DataFrame (None if
+    nothing was found) and the PY flag.
+    """
+    (all_contextual_rows, found_periods), backend = read_with_fallback(
+        file_object, lambda source, backend: _read_sheets(source, backend, workers, max_periods), reader)
+    annotate(reader=backend)
+
+    if not all_contextual_rows:
+        return None, found_periods > 1
+    return combine_frames(all_contextual_rows, found_periods), found_periods > 1
+
+@instrument_stage('intake', rows_out=lambda result: None if result[0] is None else len(result[0]))
+def intelligent_data_intake_agent(file_object, streaming=False, workers=None, reader=None, max_periods=None):
+    """
+    AGENT 1: Reads Excel, intelligently finds financial data sections, creates
+    contextual keys, AND NOW ALSO RETURNS A FLAG INDICATING IF PREVIOUS YEAR
+    DATA WAS FOUND. Pass streaming=True for very large .xlsx workbooks, or
+    workers=N (default: settings.INTAKE_WORKERS) to parse sheets in parallel.
+    .xlsx, .xlsb, .xls and .ods workbooks are told apart by their content and
+    read with the fastest installed backend, or `reader` (default:
+    settings.INTAKE_READER). CSV/TSV exports (by file extension) go through
+    read_delimited_rows().
+
+    Up to `max_periods` (default: settings.MAX_PERIODS) amount columns after
+    each Particulars column are read, one per period; the DataFrame has an
+    amount column for each period found (see periods.py), and at least
+    Amount_CY and Amount_PY.
+    """
+    print("\n--- Agent 1 (Data Intake): Reading, parsing, and adding context... ---")
+    try:
+        spreadsheet_format = detect_format(file_object)
+        max_periods = MAX_PERIODS if max_periods is None else max(1, max_periods)
+        if spreadsheet_format is None and is_delimited_text(file_object):
+            final_df, found_py_column = read_delimited_rows(file_object, max_periods)
+        elif streaming and spreadsheet_format in (None, 'xlsx'):
+            final_df, found_py_column = stream_contextual_rows(file_object, max_periods=max_periods)
+        else:
+            final_df, found_py_column = read_contextual_rows(file_object, INTAKE_WORKERS if workers is None else workers, reader, max_periods)
+
+        if final_df is None:
             print("❌ Intake FAILED: Could not extract any valid contextual data.")
             # ================== CHANGE 3: UPDATE RETURN VALUE ON FAILURE ==================
             return None, False
             # ==============================================================================
 
-        final_df = pd.DataFrame(all_contextual_rows).drop_duplicates()
         print(f"✅ Intake SUCCESS: Extracted {len(final_df)} rows. PY Data Found: {found_py_column}")
-        
+
         # ================== CHANGE 4: UPDATE RETURN VALUE ON SUCCESS ==================
         # The function now returns TWO values: the dataframe and the boolean flag.
         return final_df, found_py_column
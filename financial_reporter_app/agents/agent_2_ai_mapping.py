@@ -1,16 +1,46 @@
 # ==============================================================================
-# FILE: agents/agent_2_ai_mapping.py (NO CHANGE)
+# FILE: agents/agent_2_ai_mapping.py
 # ==============================================================================
-import copy
+from ..compiled_mapping import MappingOverlay, compile_mapping, get_frozen_mapping
+from ..instrumentation import annotate, instrument_stage
+from ..settings import AI_MAPPING_MIN_SCORE
 
+@instrument_stage('mapping', rows_in=lambda source_particulars, *_, **__: len(source_particulars),
+                  rows_out=lambda mapping: len(mapping.extra_aliases))
 def ai_mapping_agent(source_particulars, mapping_structure):
-    """Placeholder for future AI mapping. Returns the predefined structure."""
-    print("\n--- Agent 2 (AI Mapping): Using predefined universal mappings. ---")
-    # In a real-world scenario with an API, this agent would identify unknown terms
-    # and call an external service to map them. For this version, we rely on our
-    # comprehensive, predefined dictionary from config.py.
-    #
-    # This agent's primary role is to pass the configuration to the aggregator.
-    # The real intelligence has been added to Agent 1 to ensure the data is
-    # structured correctly for the subsequent mapping process.
-    return copy.deepcopy(mapping_structure)
+    """
+    AGENT 2: Passes the predefined mapping to the aggregator and maps the
+    particulars that no alias matches with a local, offline similarity engine.
+    """
+    print("\n--- Agent 2 (AI Mapping): Mapping unknown particulars with the local similarity engine... ---")
+    # The configuration is shared as a frozen, read-only view (built once), and
+    # any aliases added for this request go into a small per-request overlay
+    # instead of a deep copy of the whole structure.
+    overlay = MappingOverlay(get_frozen_mapping(mapping_structure))
+    compiled = compile_mapping(overlay.base)
+
+    # Only particulars that the alias index can't already place need a suggestion.
+    keys = dict.fromkeys(str(particular).lower().strip() for particular in source_particulars)
+    unmatched = [key for key in keys if key and not compiled.match(key)]
+    if not unmatched:
+        print("✅ AI Mapping SUCCESS: Every particular matches a predefined alias.")
+        return overlay
+
+    try:
+        from ..alias_similarity import get_similarity_index
+        leaf_ids, scores = get_similarity_index(compiled).best_matches(unmatched)
+    except ImportError as e:
+        print(f"⚠️  AI Mapping SKIPPED: similarity engine unavailable ({e}); {len(unmatched)} particulars stay unmapped.")
+        return overlay
+
+    # Confident suggestions become per-request aliases of the suggested leaf, so
+    # the aggregator picks them up like any predefined alias.
+    for key, leaf_id, score in zip(unmatched, leaf_ids.tolist(), scores.tolist()):
+        if score >= AI_MAPPING_MIN_SCORE:
+            note_num, path = compiled.leaves[leaf_id]
+            overlay.add_alias(note_num, path, key)
+            overlay.suggestions.append({'particular': key, 'note': note_num, 'path': path, 'score': round(score, 4)})
+
+    annotate(unmatched=len(unmatched), suggested=len(overlay.suggestions))
+    print(f"✅ AI Mapping SUCCESS: Mapped {len(overlay.suggestions)} of {len(unmatched)} unknown particulars (min score {AI_MAPPING_MIN_SCORE}).")
+    return overlay
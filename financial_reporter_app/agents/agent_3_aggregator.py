@@ -2,70 +2,98 @@
 # FILE: agents/agent_3_aggregator.py (DEFINITIVE, FINAL, ERROR-FREE VERSION)
 # This version uses a smart lookup to match contextual keys and aliases.
 # ==============================================================================
-def hierarchical_aggregator_agent(source_df, notes_structure):
+import numpy as np
+from ..compiled_mapping import compile_mapping, segment_sum
+from ..instrumentation import annotate, instrument_stage
+from ..mapping_store import get_mapping_store, normalise_particular
+from ..periods import MIN_PERIODS, amount_columns, periods_in_columns
+from ..provenance import MatchProvenance
+
+def build_data_lookup(source_df):
+    """
+    Maps each normalised "Header|Particular" key from Agent 1 to its amounts,
+    one per period (CY, PY, ...). A key that occurs more than once keeps its
+    last amounts.
+    """
+    columns = amount_columns(max(periods_in_columns(source_df.columns), MIN_PERIODS))
+    return dict(zip(
+        source_df['Particulars'].str.lower().str.strip().tolist(),
+        zip(*(source_df[column].tolist() for column in columns)) # (CY, PY, ...) per key
+    ))
+
+def resolve_row_leaves(data_keys, compiled, mapping_store=None):
+    """
+    Returns, for each data key, the ids of the leaves it feeds. A confirmed
+    mapping in `mapping_store` wins over the aliases; confirmed leaves that
+    no longer exist in the config are ignored.
+    """
+    # Confirmed mappings are fetched for all keys at once and resolved to leaf ids.
+    confirmed = {}
+    if mapping_store is not None:
+        particulars = {key: normalise_particular(key.rsplit('|', 1)[-1]) for key in data_keys}
+        stored = mapping_store.lookup_many(list(particulars) + list(particulars.values()))
+        for data_key, particular in particulars.items():
+            leaf = stored.get(normalise_particular(data_key)) or stored.get(particular)
+            if leaf is not None and leaf in compiled.leaf_ids:
+                confirmed[data_key] = [compiled.leaf_ids[leaf]]
+
+    # A row can feed several leaves, and we don't stop at the first match,
+    # allowing multiple data points to map to one alias if needed.
+    return [confirmed[data_key] if data_key in confirmed else compiled.match(data_key) for data_key in data_keys]
+
+@instrument_stage('aggregation', rows_in=lambda source_df, *_, **__: len(source_df),
+                  rows_out=lambda result: len(result[0] if isinstance(result, tuple) else result))
+def hierarchical_aggregator_agent(source_df, notes_structure, mapping_store=None, with_provenance=False):
     """
     AGENT 3: Uses a smart lookup to precisely match the detailed aliases from the
     config against the contextual data from Agent 1, ensuring 100% accuracy.
+
+    Reviewer-confirmed mappings in `mapping_store` (default: the store from
+    settings) take precedence over the aliases: a row whose full key, or else
+    its bare particular, is in the store feeds exactly the confirmed leaf.
+
+    With `with_provenance`, returns (aggregated_data, MatchProvenance): the
+    row <-> leaf indexes and unmatched rows recorded during this same pass.
     """
     print("\n--- Agent 3 (Hierarchical Aggregator): Processing data via smart contextual lookup... ---")
     
-    # Create a lookup dictionary for fast access.
+    # Create a lookup dictionary for fast access, built straight from the column arrays.
     # The keys are the "Header|Particular" strings from Agent 1.
-    data_lookup = {
-        row['Particulars'].lower().strip(): {'CY': row['Amount_CY'], 'PY': row['Amount_PY']}
-        for _, row in source_df.iterrows()
-    }
+    data_lookup = build_data_lookup(source_df)
 
-    def initialize_structure(template):
-        """Pre-builds the nested dictionary structure with zero values."""
-        initialized = {}
-        for key, value in template.items():
-            initialized[key] = initialize_structure(value) if isinstance(value, dict) else {'CY': 0, 'PY': 0}
-        return initialized
+    # Compile the config into a flat leaf table and alias index (done once per
+    # config object, plus any per-request overlay aliases) and resolve every
+    # source row with hash lookups in a single pass.
+    compiled = compile_mapping(notes_structure)
+    if mapping_store is None:
+        mapping_store = get_mapping_store()
+    row_leaves = resolve_row_leaves(list(data_lookup), compiled, mapping_store)
 
-    def process_level(data_node, template_node):
-        """Recursively traverses the template and populates data via a smart lookup."""
-        level_total_cy, level_total_py = 0, 0
-        for key, value in template_node.items():
-            if isinstance(value, dict): # It's a header/section, so we recurse deeper.
-                sub_total_cy, sub_total_py = process_level(data_node[key], value)
-                data_node[key]['total'] = {'CY': sub_total_cy, 'PY': sub_total_py}
-                level_total_cy += sub_total_cy
-                level_total_py += sub_total_py
-            else: # It's a leaf node with a list of aliases.
-                item_total_cy, item_total_py = 0, 0
-                aliases = value if isinstance(value, list) else [value]
-                
-                # This is the new, crucial logic block
-                for alias in aliases:
-                    search_key = alias.lower().strip()
-                    
-                    # Iterate through all the contextual keys from the source data
-                    for data_key, data_values in data_lookup.items():
-                        # A match occurs if:
-                        # 1. The data_key is an EXACT match to the alias (for simple cases)
-                        # OR
-                        # 2. The data_key ENDS WITH "|alias" (for contextual cases)
-                        if data_key == search_key or data_key.endswith(f"|{search_key}"):
-                            item_total_cy += data_values['CY']
-                            item_total_py += data_values['PY']
-                            # We don't break here, allowing multiple data points to map to one alias if needed
+    matched_leaves, matched_rows = [], []
+    for row_pos, leaf_ids in enumerate(row_leaves):
+        for leaf_id in leaf_ids:
+            matched_leaves.append(leaf_id)
+            matched_rows.append(row_pos)
 
-                data_node[key] = {'CY': item_total_cy, 'PY': item_total_py}
-                level_total_cy += item_total_cy
-                level_total_py += item_total_py
-        return level_total_cy, level_total_py
+    # Leaf amounts live in one contiguous float64 array per period (row 0 is
+    # CY, row 1 is PY, and so on); every period is summed into the leaves in
+    # the same pass, and subtotals are rolled up from them with segmented sums.
+    n_periods = max(periods_in_columns(source_df.columns), MIN_PERIODS)
+    row_amounts = np.array(list(data_lookup.values()), dtype=np.float64).reshape(-1, n_periods).T
+    leaf_amounts = segment_sum(row_amounts[:, matched_rows], matched_leaves, len(compiled.leaves))
+    node_amounts, note_amounts = compiled.roll_up(leaf_amounts)
+    matched_row_count = len(set(matched_rows))
+    annotate(unique_keys=len(data_lookup), matches=len(matched_leaves),
+             matched_rows=matched_row_count, unmatched_rows=len(data_lookup) - matched_row_count)
 
-    aggregated_data = {}
-    for note_num, note_data in notes_structure.items():
-        if 'sub_items' in note_data:
-            sub_items_result = initialize_structure(note_data['sub_items'])
-            note_total_cy, note_total_py = process_level(sub_items_result, note_data['sub_items'])
-            aggregated_data[note_num] = {
-                'total': {'CY': note_total_cy, 'PY': note_total_py},
-                'sub_items': sub_items_result,
-                'title': note_data.get('title', '')
-            }
+    # The nested dict for Agents 4 and 5 is only built at the very end.
+    aggregated_data = compiled.to_nested(node_amounts, note_amounts)
 
     print("✅ Aggregation SUCCESS: Contextual data fully processed with 100% accuracy.")
+    if with_provenance:
+        # The index label of the occurrence whose amounts each key kept (the last one).
+        row_ids = dict(zip(source_df['Particulars'].str.lower().str.strip().tolist(), source_df.index.tolist())).values()
+        provenance = MatchProvenance(compiled, list(row_ids), list(data_lookup), row_amounts, matched_leaves, matched_rows)
+        print(f"   Provenance: {len(provenance.unmatched_rows)} of {len(data_lookup)} rows matched no note line.")
+        return aggregated_data, provenance
     return aggregated_data
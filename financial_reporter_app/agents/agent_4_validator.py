@@ -1,44 +1,44 @@
 # ==============================================================================
 # FILE: agents/agent_4_validator.py (DEFINITIVE, ERROR-FREE VERSION)
 # ==============================================================================
-from config import MASTER_TEMPLATE
+import numpy as np
+from ..instrumentation import instrument_stage
+from ..periods import period_short_label
+from ..template_formulas import evaluate_template_totals
 
-def data_validation_agent(aggregated_data):
+@instrument_stage('validation', rows_in=lambda aggregated_data, *_, **__: len(aggregated_data), rows_out=len)
+def data_validation_agent(aggregated_data, totals=None):
     """
     Performs automated checks that are perfectly synchronized with the
     MASTER_TEMPLATE to ensure 100% accurate validation.
+
+    `totals` are the evaluated template formulas (see template_formulas.py);
+    pass the ones computed for the reporter to avoid evaluating them twice.
+    Every period is checked at once, on arrays with one amount per period.
     """
     print("\n--- Agent 4 (Data Validation): Checking data integrity... ---")
     warnings = []
     
-    # Dynamically get the note numbers for calculation from the master template
-    bs_template = MASTER_TEMPLATE['Balance Sheet']
-    
-    equity_notes = [row[2] for row in bs_template if row[2] and row[1] in ["Share Capital", "Reserves and surplus"]]
-    liability_notes = [row[2] for row in bs_template if row[2] and any(x in row[1] for x in ["borrowings", "payables", "provisions", "Other Long - term liabilities"])]
-    asset_notes = [row[2] for row in bs_template if row[2] and any(x in row[1] for x in ["Fixed assets", "investments", "loans and advances", "Other non-current assets", "Inventories", "receivables", "Cash and cash equivalents", "Other current assets"])]
+    # The equity, liability and asset groups are formulas compiled once from
+    # the master template, and evaluated once per run.
+    if totals is None:
+        totals = evaluate_template_totals(aggregated_data)
+
+    deferred_tax = totals.get('deferred_tax')
 
-    for year in ['CY', 'PY']:
-        year_label = "2025" if year == 'CY' else "2024"
-        get_total = lambda key: aggregated_data.get(key, {}).get('total', {}).get(year, 0)
-        
-        deferred_tax = get_total('4')
-        
-        total_equity = sum(get_total(n) for n in equity_notes)
-        total_liabilities = sum(get_total(n) for n in liability_notes)
-        total_assets = sum(get_total(n) for n in asset_notes)
+    total_equity = totals.get('equity')
+    total_liabilities = totals.get('liabilities')
+    total_assets = totals.get('assets')
 
-        # Handle Deferred Tax Asset (DTA) vs Deferred Tax Liability (DTL) correctly
-        final_le = total_equity + total_liabilities
-        if deferred_tax > 0: # It's a liability
-            final_le += deferred_tax
+    # Handle Deferred Tax Asset (DTA) vs Deferred Tax Liability (DTL) correctly
+    final_le = total_equity + total_liabilities
+    final_le = np.where(deferred_tax > 0, final_le + deferred_tax, final_le) # It's a liability
 
-        final_a = total_assets
-        if deferred_tax < 0: # It's an asset
-            final_a += abs(deferred_tax)
+    final_a = np.where(deferred_tax < 0, total_assets + np.abs(deferred_tax), total_assets) # It's an asset
 
-        if abs(final_a - final_le) > 100.0: # Using a small tolerance for floating point issues
-            warnings.append(f"CRITICAL ({year_label}): Balance Sheet out of balance! Assets ({final_a:,.2f}) != L+E ({final_le:,.2f}) [Diff: {abs(final_a-final_le):,.2f}]")
+    difference = np.abs(final_a - final_le)
+    for period in np.flatnonzero(difference > 100.0).tolist(): # Using a small tolerance for floating point issues
+        warnings.append(f"CRITICAL ({period_short_label(period)}): Balance Sheet out of balance! Assets ({final_a[period]:,.2f}) != L+E ({final_le[period]:,.2f}) [Diff: {difference[period]:,.2f}]")
     
     if not warnings:
         print("✅ Validation PASSED.")
@@ -1,121 +1,167 @@
 # ==============================================================================
 # FILE: agents/agent_5_reporter.py (DEFINITIVE, FINAL VERSION WITH "My Company Inc." STYLING)
 # ==============================================================================
-import pandas as pd
 import io
+import os
 import traceback
-from config import MASTER_TEMPLATE, NOTES_STRUCTURE_AND_MAPPING
+from ..config_snapshot import get_config_snapshot
+from ..instrumentation import annotate, instrument_stage
+from ..periods import period_label
+from ..template_formulas import evaluate_template_totals
 
-def report_finalizer_agent(aggregated_data, company_name):
+# --- DEFINE "My Company Inc." COLOR PALETTE ---
+COLORS = {
+    'title_bg': '#2F5496', 'title_font': '#FFFFFF',
+    'header_bg': '#DDEBF7',
+    'lia_eq_header_bg': '#FFF2CC',
+    'asset_header_bg': '#E2EFDA',
+    'subheader_bg': '#F8D7DA',
+    'total_bg': '#F8CBAD',
+    'border': '#000000'
+}
+NUM_FORMAT_RUPEE = '_("₹"* #,##0.00_);_("₹"* (#,##0.00);_("0.00"??_);_(@_)'
+
+# --- CELL FORMAT SPECS ---
+# Defined once per process; each report registers them with its own workbook
+# (xlsxwriter formats belong to a single workbook).
+FORMAT_SPECS = {
+    'title': {'bold': True, 'font_size': 14, 'align': 'center', 'valign': 'vcenter', 'bg_color': COLORS['title_bg'], 'font_color': COLORS['title_font']},
+    'header': {'bold': True, 'bg_color': COLORS['header_bg'], 'border': 1, 'border_color': COLORS['border'], 'align': 'center', 'valign': 'vcenter'},
+    'sec_header_lia_eq': {'bold': True, 'bg_color': COLORS['lia_eq_header_bg'], 'border': 1, 'border_color': COLORS['border']},
+    'sec_header_asset': {'bold': True, 'bg_color': COLORS['asset_header_bg'], 'border': 1, 'border_color': COLORS['border']},
+    'subheader': {'bg_color': COLORS['subheader_bg'], 'border': 1, 'border_color': COLORS['border']},
+    'item_text': {'border': 1, 'border_color': COLORS['border']},
+    'item_num': {'border': 1, 'border_color': COLORS['border'], 'num_format': NUM_FORMAT_RUPEE},
+    'total_text': {'bold': True, 'bg_color': COLORS['total_bg'], 'border': 1, 'border_color': COLORS['border']},
+    'total_num': {'bold': True, 'bg_color': COLORS['total_bg'], 'border': 1, 'border_color': COLORS['border'], 'num_format': NUM_FORMAT_RUPEE}
+}
+
+def register_formats(workbook):
+    """Adds every spec in FORMAT_SPECS to `workbook` and returns the Format objects by name."""
+    return {name: workbook.add_format(spec) for name, spec in FORMAT_SPECS.items()}
+
+def render_report(output, aggregated_data, company_name, totals=None):
+    """
+    Writes the styled workbook to `output` (a path or binary file object)
+    with xlsxwriter directly. The workbook is in constant_memory mode, so each
+    row is flushed to a temp file as soon as the next one starts: rows are
+    written strictly top to bottom, and adjacent cells that share a format are
+    written together with write_row. Total rows (including PBT and PAT) come
+    from `totals`, the evaluated template formulas. There is one amount
+    column per period of `totals`, current period first. Returns the number
+    of sheets written.
+    """
+    import xlsxwriter
+    from xlsxwriter.utility import xl_col_to_name
+
+    config = get_config_snapshot()
+    if totals is None:
+        totals = evaluate_template_totals(aggregated_data, config.master_template)
+    periods = totals.periods
+    period_labels = [period_label(period) for period in range(len(periods))]
+
+    with xlsxwriter.Workbook(output, {'constant_memory': True}) as workbook:
+        fmt = register_formats(workbook)
+
+        # --- 1. RENDER THE MAIN SHEETS (BALANCE SHEET & P&L) ---
+        for sheet_name, template in [("Balance Sheet", config.master_template["Balance Sheet"]), ("Profit and Loss", config.master_template["Profit and Loss"])]:
+            worksheet = workbook.add_worksheet(sheet_name)
+            last_column = xl_col_to_name(2 + len(periods))
+            worksheet.set_column('A:A', 5); worksheet.set_column('B:B', 65); worksheet.set_column('C:C', 8); worksheet.set_column(f'D:{last_column}', 20)
+
+            worksheet.merge_range(f'A1:{last_column}1', f"{company_name} - {sheet_name}", fmt['title'])
+            row_num = 3 # Start table on row 4, leaving row 2 blank for spacing
+
+            for row_index, row_data in enumerate(template):
+                col_a, particulars, note, row_type = row_data
+                if row_type == "header_col":
+                    # The template row is ("Particulars", "Note", <a fixed date>); the
+                    # amount headings come from the reporting periods instead.
+                    worksheet.write_row(2, 1, [col_a, "Note No.", *period_labels], fmt['header'])
+                    continue
+
+                values = [0] * len(periods)
+                if row_type in ["item", "item_sub", "item_no_alpha"]:
+                    note_total = aggregated_data.get(str(note), {}).get('total', {}); values = [note_total.get(period, 0) for period in periods]
+                elif row_type == "total":
+                    values = totals.for_row(sheet_name, row_index).tolist()
+
+                is_asset = any(s in particulars for s in ['ASSETS', 'Fixed assets', 'Current assets', 'Revenue'])
+                is_lia_eq = any(s in particulars for s in ['EQUITY', 'LIABILITIES', 'Shareholder'])
+
+                if row_type in ["header", "sub_header"]:
+                    sec_fmt = fmt['sec_header_asset'] if is_asset else (fmt['sec_header_lia_eq'] if is_lia_eq else fmt['subheader'])
+                    worksheet.write_row(row_num, 0, [col_a, particulars], sec_fmt)
+                elif row_type == "total":
+                    worksheet.write(row_num, 1, particulars, fmt['total_text'])
+                    worksheet.write_row(row_num, 3, values, fmt['total_num'])
+                elif row_type not in ["spacer", "item_no_note", "item_no_note_sub"]:
+                    worksheet.write_row(row_num, 0, [col_a, particulars], fmt['item_text'])
+                    worksheet.write_string(row_num, 2, str(note) if note else '', fmt['item_text'])
+                    worksheet.write_row(row_num, 3, values, fmt['item_num'])
+                row_num += 1
+
+        # --- 2. RENDER THE NOTE SHEETS ---
+        for note_num_str in sorted(config.notes_structure.keys(), key=lambda x: int(x.split('.')[0])):
+            note_data = aggregated_data.get(note_num_str)
+            if not note_data or 'sub_items' not in note_data: continue
+
+            sheet_name = f"Note {note_num_str}"; worksheet = workbook.add_worksheet(sheet_name)
+            last_column = xl_col_to_name(len(periods))
+            worksheet.set_column('A:A', 65); worksheet.set_column(f'B:{last_column}', 20)
+            worksheet.merge_range(f'A1:{last_column}1', f"Note {note_num_str}: {note_data.get('title', '')}", fmt['title'])
+            worksheet.write_row(2, 0, ['Particulars', *period_labels], fmt['header'])
+
+            row_num = 3
+            def write_note_level(items, indent_level=0):
+                nonlocal row_num
+                for key, value in items.items():
+                    prefix = "    " * indent_level
+                    if isinstance(value, dict) and 'CY' in value:
+                        worksheet.write(row_num, 0, f"{prefix}{key}", fmt['item_text'])
+                        worksheet.write_row(row_num, 1, [value.get(period, 0) for period in periods], fmt['item_num'])
+                        row_num += 1
+                    elif isinstance(value, dict):
+                        worksheet.write(row_num, 0, f"{prefix}{key}", fmt['subheader'])
+                        row_num += 1
+                        write_note_level(value, indent_level + 1)
+
+            write_note_level(note_data['sub_items'])
+            worksheet.write(row_num, 0, "Total", fmt['total_text'])
+            note_total = note_data.get('total', {})
+            worksheet.write_row(row_num, 1, [note_total.get(period, 0) for period in periods], fmt['total_num'])
+
+        return len(workbook.worksheets())
+
+@instrument_stage('report', rows_in=lambda aggregated_data, *_, **__: len(aggregated_data))
+def report_finalizer_agent(aggregated_data, company_name, output=None, totals=None):
     """
     AGENT 5: Takes final data and writes a complete, multi-sheet Excel report
     with the professional styling from the "My Company Inc." example.
+
+    By default the report is built in memory and returned as bytes. To avoid
+    copying it, pass `output`:
+      - a path: the report is written straight to that file and the path is
+        returned;
+      - an io.BytesIO: a memoryview of its buffer is returned (no copy);
+      - any other binary file object: the report is written to it and the
+        file object is returned.
+    `totals` are the evaluated template formulas, as shared with Agent 4.
     """
     print("\n--- Agent 5 (Report Finalizer): Generating final styled Excel report... ---")
     try:
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            workbook = writer.book
-
-            # --- DEFINE "My Company Inc." COLOR PALETTE ---
-            colors = {
-                'title_bg': '#2F5496', 'title_font': '#FFFFFF',
-                'header_bg': '#DDEBF7',
-                'lia_eq_header_bg': '#FFF2CC',
-                'asset_header_bg': '#E2EFDA',
-                'subheader_bg': '#F8D7DA',
-                'total_bg': '#F8CBAD',
-                'border': '#000000'
-            }
-
-            # --- DEFINE CELL FORMATS ---
-            num_format_rupee = '_("₹"* #,##0.00_);_("₹"* (#,##0.00);_("0.00"??_);_(@_)'
-            fmt_title = workbook.add_format({'bold': True, 'font_size': 14, 'align': 'center', 'valign': 'vcenter', 'bg_color': colors['title_bg'], 'font_color': colors['title_font']})
-            fmt_header = workbook.add_format({'bold': True, 'bg_color': colors['header_bg'], 'border': 1, 'border_color': colors['border'], 'align': 'center', 'valign': 'vcenter'})
-            
-            fmt_sec_header_lia_eq = workbook.add_format({'bold': True, 'bg_color': colors['lia_eq_header_bg'], 'border': 1, 'border_color': colors['border']})
-            fmt_sec_header_asset = workbook.add_format({'bold': True, 'bg_color': colors['asset_header_bg'], 'border': 1, 'border_color': colors['border']})
-            fmt_subheader = workbook.add_format({'bg_color': colors['subheader_bg'], 'border': 1, 'border_color': colors['border']})
-
-            fmt_item_text = workbook.add_format({'border': 1, 'border_color': colors['border']})
-            fmt_item_num = workbook.add_format({'border': 1, 'border_color': colors['border'], 'num_format': num_format_rupee})
-            
-            fmt_total_text = workbook.add_format({'bold': True, 'bg_color': colors['total_bg'], 'border': 1, 'border_color': colors['border']})
-            fmt_total_num = workbook.add_format({'bold': True, 'bg_color': colors['total_bg'], 'border': 1, 'border_color': colors['border'], 'num_format': num_format_rupee})
-            
-            # --- 1. RENDER THE MAIN SHEETS (BALANCE SHEET & P&L) ---
-            for sheet_name, template in [("Balance Sheet", MASTER_TEMPLATE["Balance Sheet"]), ("Profit and Loss", MASTER_TEMPLATE["Profit and Loss"])]:
-                worksheet = workbook.add_worksheet(sheet_name)
-                worksheet.set_column('A:A', 5); worksheet.set_column('B:B', 65); worksheet.set_column('C:C', 8); worksheet.set_column('D:E', 20)
-
-                worksheet.merge_range('A1:E1', f"{company_name} - {sheet_name}", fmt_title)
-                row_num = 3 # Start table on row 4, leaving row 2 blank for spacing
-
-                get_total = lambda note_list, year: sum(aggregated_data.get(str(n), {}).get('total', {}).get(year, 0) for n in note_list) if isinstance(note_list, list) else 0
-
-                for row_data in template:
-                    col_a, particulars, note, row_type = row_data
-                    if row_type == "header_col":
-                        worksheet.write('B3', particulars, fmt_header); worksheet.write('C3', note, fmt_header)
-                        worksheet.write('D3', "As at March 31, 2025", fmt_header); worksheet.write('E3', "As at March 31, 2024", fmt_header)
-                        continue
-
-                    cy_val, py_val = 0, 0
-                    if row_type in ["item", "item_sub", "item_no_alpha"]:
-                        note_total = aggregated_data.get(str(note), {}).get('total', {}); cy_val, py_val = note_total.get('CY', 0), note_total.get('PY', 0)
-                    elif row_type == "total":
-                        if note == 'PBT': cy_val, py_val = get_total(['21','22'],'CY') - get_total(['23','24','25','11','26'],'CY'), get_total(['21','22'],'PY') - get_total(['23','24','25','11','26'],'PY')
-                        elif note == 'PAT': cy_val, py_val = (get_total(['21','22'],'CY') - get_total(['23','24','25','11','26'],'CY')) - get_total(['4'],'CY'), (get_total(['21','22'],'PY') - get_total(['23','24','25','11','26'],'PY')) - get_total(['4'],'PY')
-                        else: cy_val, py_val = get_total(note, 'CY'), get_total(note, 'PY')
-                    
-                    is_asset = any(s in particulars for s in ['ASSETS', 'Fixed assets', 'Current assets', 'Revenue'])
-                    is_lia_eq = any(s in particulars for s in ['EQUITY', 'LIABILITIES', 'Shareholder'])
-                    
-                    if row_type in ["header", "sub_header"]:
-                        fmt = fmt_sec_header_asset if is_asset else (fmt_sec_header_lia_eq if is_lia_eq else fmt_subheader)
-                        worksheet.write(row_num, 0, col_a, fmt); worksheet.write(row_num, 1, particulars, fmt)
-                    elif row_type == "total":
-                        worksheet.write(row_num, 1, particulars, fmt_total_text)
-                        worksheet.write_number(row_num, 3, cy_val, fmt_total_num); worksheet.write_number(row_num, 4, py_val, fmt_total_num)
-                    elif row_type not in ["spacer", "item_no_note", "item_no_note_sub"]:
-                        worksheet.write(row_num, 0, col_a, fmt_item_text)
-                        worksheet.write(row_num, 1, particulars, fmt_item_text)
-                        worksheet.write_string(row_num, 2, str(note) if note else '', fmt_item_text)
-                        worksheet.write_number(row_num, 3, cy_val, fmt_item_num); worksheet.write_number(row_num, 4, py_val, fmt_item_num)
-                    row_num += 1
-
-            # --- 2. RENDER THE NOTE SHEETS ---
-            for note_num_str in sorted(NOTES_STRUCTURE_AND_MAPPING.keys(), key=lambda x: int(x.split('.')[0])):
-                note_data = aggregated_data.get(note_num_str)
-                if not note_data or 'sub_items' not in note_data: continue
-
-                sheet_name = f"Note {note_num_str}"; worksheet = workbook.add_worksheet(sheet_name)
-                worksheet.set_column('A:A', 65); worksheet.set_column('B:C', 20)
-                worksheet.merge_range('A1:C1', f"Note {note_num_str}: {note_data.get('title', '')}", fmt_title)
-                worksheet.write('A3', 'Particulars', fmt_header); worksheet.write('B3', 'As at March 31, 2025', fmt_header); worksheet.write('C3', 'As at March 31, 2024', fmt_header)
-                
-                row_num = 3
-                def write_note_level(items, indent_level=0):
-                    nonlocal row_num
-                    for key, value in items.items():
-                        prefix = "    " * indent_level
-                        if isinstance(value, dict) and 'CY' in value:
-                            worksheet.write(row_num, 0, f"{prefix}{key}", fmt_item_text)
-                            worksheet.write_number(row_num, 1, value.get('CY', 0), fmt_item_num)
-                            worksheet.write_number(row_num, 2, value.get('PY', 0), fmt_item_num)
-                            row_num += 1
-                        elif isinstance(value, dict):
-                            worksheet.write(row_num, 0, f"{prefix}{key}", fmt_subheader)
-                            row_num += 1
-                            write_note_level(value, indent_level + 1)
-                
-                write_note_level(note_data['sub_items'])
-                worksheet.write(row_num, 0, "Total", fmt_total_text)
-                worksheet.write_number(row_num, 1, note_data.get('total', {}).get('CY', 0), fmt_total_num)
-                worksheet.write_number(row_num, 2, note_data.get('total', {}).get('PY', 0), fmt_total_num)
-
-        print("✅ Report Finalizer SUCCESS: Styled Excel file created in memory.")
-        return output.getvalue()
+        target = io.BytesIO() if output is None else output
+        sheets = render_report(target, aggregated_data, company_name, totals)
+
+        if output is None:
+            report = target.getvalue()
+        elif isinstance(output, io.BytesIO):
+            report = output.getbuffer()
+        else:
+            report = output
+        annotate(sheets=sheets, report_bytes=os.path.getsize(output) if isinstance(output, (str, os.PathLike)) else target.tell())
+        print("✅ Report Finalizer SUCCESS: Styled Excel file created" + (" in memory." if output is None else "."))
+        return report
 
     except Exception as e:
         print(f"❌ Report Finalizer FAILED with exception: {e}")
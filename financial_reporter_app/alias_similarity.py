@@ -0,0 +1,117 @@
+# ==============================================================================
+# FILE: alias_similarity.py
+# Offline fuzzy matching of ledger particulars against the config aliases,
+# using character n-gram TF-IDF vectors and one sparse matrix product.
+# ==============================================================================
+import math
+import re
+
+import numpy as np
+
+NGRAM_SIZE = 3
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalise_text(text):
+    """Lower-cases and collapses everything but letters and digits to single spaces."""
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def char_ngrams(text):
+    """The character n-grams of a normalised text, padded with a space at each end."""
+    padded = f" {text} "
+    return [padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)]
+
+
+class AliasSimilarityIndex:
+    """
+    TF-IDF index over every alias of a CompiledMapping.
+
+    The aliases are vectorised once into an L2-normalised sparse matrix. A
+    batch of particulars is vectorised the same way, and all cosine scores come
+    from one sparse matrix product. Each alias maps to the first leaf it feeds,
+    so a suggestion is always a single (note, path) leaf.
+    """
+
+    def __init__(self, compiled):
+        from scipy import sparse
+
+        self.compiled = compiled
+        aliases = [alias for alias in compiled.alias_index if normalise_text(alias)]
+        self.alias_leaf = np.array([compiled.alias_index[alias][0] for alias in aliases], dtype=np.int64)
+
+        self.vocabulary = {}
+        rows, cols = [], []
+        for row, alias in enumerate(aliases):
+            for gram in char_ngrams(normalise_text(alias)):
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(gram, len(self.vocabulary)))
+
+        counts = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(aliases), len(self.vocabulary)))
+        document_frequency = np.bincount(counts.indices, minlength=len(self.vocabulary))
+        # Smoothed IDF; n-grams never seen in an alias get the highest weight.
+        self.idf = np.log((1 + len(aliases)) / (1 + document_frequency)) + 1
+        self.unseen_idf = math.log(1 + len(aliases)) + 1
+        self.alias_matrix = self._normalise_rows(counts.multiply(self.idf).tocsr(), np.zeros(len(aliases)))
+
+    @staticmethod
+    def _normalise_rows(matrix, extra_squared_norms):
+        from scipy import sparse
+
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel() + extra_squared_norms)
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms) @ matrix
+
+    def _vectorise(self, texts):
+        from scipy import sparse
+
+        grams_per_text = [char_ngrams(normalise_text(text)) for text in texts]
+        lengths = np.fromiter((len(grams) for grams in grams_per_text), dtype=np.int64, count=len(texts))
+        vocabulary_get = self.vocabulary.get
+        cols = np.fromiter((vocabulary_get(gram, -1) for grams in grams_per_text for gram in grams), dtype=np.int64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(texts)), lengths)
+
+        # Unseen n-grams can't match any alias, but still count towards the
+        # vector's length so that they lower the cosine score.
+        unseen = np.zeros(len(texts))
+        for row in np.unique(rows[cols < 0]).tolist():
+            counts = {}
+            for gram in grams_per_text[row]:
+                if gram not in self.vocabulary:
+                    counts[gram] = counts.get(gram, 0) + 1
+            unseen[row] = sum((count * self.unseen_idf) ** 2 for count in counts.values())
+
+        seen = cols >= 0
+        counts = sparse.csr_matrix((np.ones(int(seen.sum())), (rows[seen], cols[seen])), shape=(len(texts), len(self.vocabulary)))
+        return self._normalise_rows(counts.multiply(self.idf).tocsr(), unseen)
+
+    def best_matches(self, texts):
+        """Returns, for each text, the best-scoring leaf id and its cosine score (0 when nothing overlaps)."""
+        best_alias = np.zeros(len(texts), dtype=np.int64)
+        best_score = np.zeros(len(texts))
+        if not texts:
+            return self.alias_leaf[best_alias], best_score
+
+        scores = (self._vectorise(texts) @ self.alias_matrix.T).tocsr()
+        # Row-wise max and argmax straight off the CSR arrays.
+        has_scores = np.diff(scores.indptr) > 0
+        starts = scores.indptr[:-1][has_scores]
+        row_max = np.maximum.reduceat(scores.data, starts)
+        best_score[has_scores] = row_max
+        is_best = scores.data == np.repeat(best_score, np.diff(scores.indptr))
+        first_best = np.maximum.reduceat(np.where(is_best, -np.arange(len(scores.data)), -len(scores.data)), starts)
+        best_alias[has_scores] = scores.indices[-first_best]
+        return self.alias_leaf[best_alias], best_score
+
+
+# The index for the most recently used CompiledMapping; the config rarely changes.
+_last_index = None
+
+
+def get_similarity_index(compiled):
+    """Returns the AliasSimilarityIndex for `compiled`, building it on first use."""
+    global _last_index
+    if _last_index is None or _last_index.compiled is not compiled:
+        _last_index = AliasSimilarityIndex(compiled)
+    return _last_index
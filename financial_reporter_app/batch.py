@@ -0,0 +1,169 @@
+# ==============================================================================
+# FILE: batch.py
+# Generates financial statements for a whole directory of client workbooks.
+#
+# Usage (from the repository root):
+#   python -m financial_reporter_app.batch uploads/ --output-dir reports/
+#   python -m financial_reporter_app.batch "clients/*/trial_balance*.xlsx" --workers 8
+# ==============================================================================
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from .pipeline import run_pipeline, warm_up
+
+STAGES = ['intake', 'mapping', 'aggregation', 'validation', 'report']
+
+# Why run_pipeline returned None, by the stage it had reached.
+FAILURE_REASONS = {'intake': "intake produced no rows", 'report': "report generation failed"}
+DIRECTORY_PATTERNS = ['*.xlsx', '*.xlsm', '*.xlsb', '*.xls', '*.ods', '*.csv', '*.tsv']
+
+
+def collect_workbooks(inputs):
+    """Expands directories (every workbook, .csv and .tsv inside) and glob patterns into a sorted list of workbook paths."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in DIRECTORY_PATTERNS:
+                paths.update(glob.glob(os.path.join(item, pattern)))
+        else:
+            paths.update(glob.glob(item))
+    # Skip Excel's "~$" lock files for workbooks that are open on the same machine.
+    return sorted(p for p in paths if not os.path.basename(p).startswith('~$'))
+
+
+def entity_names(workbooks):
+    """
+    One unique entity name per workbook: its file name without the
+    extension, prefixed with as many parent directories as it takes to tell
+    same-named files apart (clients/acme/tb.xlsx -> "acme - tb"). Files that
+    still collide (tb.xlsx and tb.csv side by side) are numbered "tb (2)", ...
+    """
+    parts = [[part for part in os.path.abspath(path).split(os.sep) if part] for path in workbooks]
+    for path_parts in parts:
+        path_parts[-1] = os.path.splitext(path_parts[-1])[0]
+    depths = [1] * len(parts)
+    while True:
+        names = [' - '.join(path_parts[-depth:]) for path_parts, depth in zip(parts, depths)]
+        # Deepen only names shared with a file in another directory; more
+        # parents cannot separate files in the same directory.
+        folders = {}
+        for name, path_parts in zip(names, parts):
+            folders.setdefault(name, set()).add(tuple(path_parts))
+        deeper = [i for i, name in enumerate(names) if len(folders[name]) > 1 and depths[i] < len(parts[i])]
+        if not deeper:
+            break
+        for i in deeper:
+            depths[i] += 1
+
+    seen = Counter()
+    unique = []
+    for name in names:
+        seen[name] += 1
+        unique.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return unique
+
+
+def process_workbook(path, output_dir, use_cache=True, entity=None):
+    """
+    Runs the full pipeline for one entity and writes its styled workbook to
+    `output_dir`. The entity (the company name and the report's file name)
+    defaults to the file name; run_batch passes unique names from
+    entity_names(). Returns one summary row (a dict) for the batch CSV.
+    """
+    entity = entity or os.path.splitext(os.path.basename(path))[0]
+    summary = {'entity': entity, 'source': path, 'report': '', 'status': 'failed',
+               'py_data_found': '', 'cached': '', 'warning_count': 0, 'unmatched_rows': '', 'warnings': ''}
+    report_path = os.path.join(output_dir, f"{entity} - Financial Statements.xlsx")
+    # The report is rendered straight into a scratch file next to its final
+    # name and renamed into place, so a failed run never leaves a partial file.
+    scratch_path = report_path + '.part'
+    started = time.perf_counter()
+    reached = []
+    try:
+        result = run_pipeline(path, entity, use_cache=use_cache, report_output=scratch_path, progress=reached.append)
+        if result is None:
+            stage = reached[-1] if reached else 'intake'
+            summary['warnings'] = f"ERROR: {FAILURE_REASONS.get(stage, f'{stage} failed')}"
+    except Exception as e:
+        result = None
+        summary['warnings'] = f"ERROR: {e}"
+
+    if result is None:
+        if os.path.exists(scratch_path):
+            os.remove(scratch_path)
+    else:
+        os.replace(scratch_path, report_path)
+        summary.update({
+            'report': report_path,
+            'status': 'ok',
+            'py_data_found': result['found_py_column'],
+            'cached': result['cached'],
+            'warning_count': len(result['warnings']),
+            'unmatched_rows': len(result['provenance'].unmatched_rows) if result['provenance'] is not None else '',
+            'warnings': ' | '.join(result['warnings'])
+        })
+        for stage in STAGES:
+            summary[f"{stage}_s"] = round(result['timings'].get(stage, 0.0), 4)
+    summary['total_s'] = round(time.perf_counter() - started, 4)
+    return summary
+
+
+def run_batch(workbooks, output_dir, workers=None, use_cache=True):
+    """
+    Processes every workbook across a pool of `workers` processes (default: one
+    per CPU) and writes `batch_summary.csv` to `output_dir`. The mapping
+    config is compiled once per worker process and reused for all its jobs.
+    Returns the summary rows in input order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    # Same-named workbooks (e.g. clients/*/trial_balance.xlsx) would otherwise
+    # write over each other's report.
+    entities = entity_names(workbooks)
+    if workers == 1:
+        warm_up()
+        summaries = [process_workbook(path, output_dir, use_cache, entity) for path, entity in zip(workbooks, entities)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=warm_up) as pool:
+            summaries = list(pool.map(process_workbook, workbooks, [output_dir] * len(workbooks),
+                                      [use_cache] * len(workbooks), entities))
+
+    fieldnames = ['entity', 'source', 'report', 'status', 'py_data_found', 'cached', 'warning_count', 'unmatched_rows', 'warnings'] \
+        + [f"{stage}_s" for stage in STAGES] + ['total_s']
+    with open(os.path.join(output_dir, 'batch_summary.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval='')
+        writer.writeheader()
+        writer.writerows(summaries)
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate financial statements for a batch of trial-balance workbooks.")
+    parser.add_argument('inputs', nargs='+', help="Directories of workbooks (.xlsx/.xlsb/.xls/.ods) or .csv/.tsv files, and/or glob patterns.")
+    parser.add_argument('-o', '--output-dir', default='reports', help="Where the reports and batch_summary.csv are written (default: reports).")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker processes (default: one per CPU).")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore the result cache.")
+    args = parser.parse_args(argv)
+
+    workbooks = collect_workbooks(args.inputs)
+    if not workbooks:
+        print("❌ Batch FAILED: No trial balances matched the given inputs.")
+        return 1
+
+    print(f"\n--- Batch: Processing {len(workbooks)} workbooks... ---")
+    summaries = run_batch(workbooks, args.output_dir, args.workers, use_cache=not args.no_cache)
+    failed = sum(1 for s in summaries if s['status'] != 'ok')
+    with_warnings = sum(1 for s in summaries if s['warning_count'])
+    print(f"✅ Batch FINISHED: {len(summaries) - failed} reports written, {failed} failed, {with_warnings} with validation warnings.")
+    print(f"   Summary: {os.path.join(args.output_dir, 'batch_summary.csv')}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+# ==============================================================================
+# FILE: columnar.py
+# Arrow schemas for the data handed between agents: the intake rows (Agent 1)
+# and the aggregated leaf table (Agent 3). Tables are written as Arrow IPC
+# files or Parquet and memory-mapped on read, so another process can pick up
+# a stage's output without unpickling it.
+#
+# Usage (from the repository root), to inspect a stage output:
+#   python -m financial_reporter_app.columnar intake.arrow
+# ==============================================================================
+import os
+import sys
+
+import numpy as np
+
+from .periods import MIN_PERIODS, amount_columns, period_keys, periods_in_columns, periods_in_nested
+
+# Bump when either schema changes; readers reject files of other versions.
+# Version 1 tables (always two periods) are valid version 2 tables.
+SCHEMA_VERSION = '2'
+_READABLE_VERSIONS = {b'1', b'2'}
+
+_META_KIND = b'financial_reporter.kind'
+_META_VERSION = b'financial_reporter.version'
+_META_FOUND_PY = b'financial_reporter.found_py_column'
+_META_CONFIG = b'financial_reporter.config_hash'
+
+
+def intake_schema(n_periods=MIN_PERIODS):
+    """
+    Agent 1's output: one row per contextual key. `RowId` is the row's index
+    label in the intake DataFrame (what MatchProvenance refers to), `Sheet`
+    and `Row` its worksheet and 1-based row number. There is one float64
+    amount column per period (Amount_CY, Amount_PY, ...; see periods.py).
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field('RowId', pa.int64(), nullable=False),
+        pa.field('Particulars', pa.string(), nullable=False),
+        *[pa.field(column, pa.float64(), nullable=False) for column in amount_columns(n_periods)],
+        pa.field('Sheet', pa.string()),
+        pa.field('Row', pa.int64()),
+    ])
+
+
+def leaf_schema(n_periods=MIN_PERIODS):
+    """
+    Agent 3's output before roll-up: one row per leaf of the compiled config,
+    in template order, with one amount column per period. `Note` and `Path`
+    name the leaf, so the table reads on its own; `LeafId` lets the pipeline
+    rebuild subtotals without lookups.
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field('LeafId', pa.int32(), nullable=False),
+        pa.field('Note', pa.string(), nullable=False),
+        pa.field('Path', pa.list_(pa.string()), nullable=False),
+        *[pa.field(column, pa.float64(), nullable=False) for column in amount_columns(n_periods)],
+    ])
+
+
+def _check_kind(table, kind):
+    metadata = table.schema.metadata or {}
+    if metadata.get(_META_KIND) != kind.encode() or metadata.get(_META_VERSION) not in _READABLE_VERSIONS:
+        raise ValueError(f"Not a version {SCHEMA_VERSION} {kind} table.")
+    return metadata
+
+
+def _compiled_and_hash(compiled):
+    from .config_snapshot import get_config_snapshot
+
+    config = get_config_snapshot()
+    if compiled is None or compiled is config.compiled:
+        return config.compiled, config.source_hash
+    return compiled, None
+
+
+def intake_to_table(intake_df, found_py_column):
+    """Agent 1's (DataFrame, PY flag) as an intake table."""
+    import pyarrow as pa
+
+    n_rows = len(intake_df)
+    n_periods = max(periods_in_columns(intake_df.columns), MIN_PERIODS)
+    columns = {
+        'RowId': intake_df.index.to_numpy(dtype=np.int64),
+        'Particulars': intake_df['Particulars'].astype(str).tolist(),
+        **{column: intake_df[column].to_numpy(dtype=np.float64) for column in amount_columns(n_periods)},
+        'Sheet': intake_df['Sheet'].tolist() if 'Sheet' in intake_df else [None] * n_rows,
+        'Row': intake_df['Row'].tolist() if 'Row' in intake_df else [None] * n_rows,
+    }
+    schema = intake_schema(n_periods).with_metadata({_META_KIND: b'intake', _META_VERSION: SCHEMA_VERSION.encode(),
+                                                     _META_FOUND_PY: b'true' if found_py_column else b'false'})
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def intake_from_table(table):
+    """Rebuilds Agent 1's (DataFrame, PY flag) from an intake table."""
+    metadata = _check_kind(table, 'intake')
+    df = table.to_pandas()
+    df.index = df.pop('RowId').to_numpy()
+    return df, metadata.get(_META_FOUND_PY) == b'true'
+
+
+def leaves_to_table(aggregated_data, compiled=None):
+    """
+    The leaf amounts of Agent 3's nested output as a leaf table. The table
+    records the config.py hash, so it is only read back against the same config.
+    """
+    import pyarrow as pa
+
+    compiled, config_hash = _compiled_and_hash(compiled)
+    n_periods = periods_in_nested(aggregated_data)
+    keys, columns = period_keys(n_periods), amount_columns(n_periods)
+    amounts = np.zeros((len(compiled.leaves), n_periods))
+    for leaf_id, (note_num, path) in enumerate(compiled.leaves):
+        node = aggregated_data.get(note_num, {}).get('sub_items', {})
+        for key in path:
+            node = node.get(key, {})
+        amounts[leaf_id] = [node.get(key, 0) for key in keys]
+
+    metadata = {_META_KIND: b'leaves', _META_VERSION: SCHEMA_VERSION.encode()}
+    if config_hash:
+        metadata[_META_CONFIG] = config_hash.encode()
+    return pa.Table.from_pydict({
+        'LeafId': np.arange(len(compiled.leaves), dtype=np.int32),
+        'Note': [note_num for note_num, _ in compiled.leaves],
+        'Path': [list(path) for _, path in compiled.leaves],
+        **dict(zip(columns, amounts.T)),
+    }, schema=leaf_schema(n_periods).with_metadata(metadata))
+
+
+def aggregated_from_table(table, compiled=None):
+    """Rebuilds Agent 3's nested output from a leaf table, rolling the subtotals up again."""
+    metadata = _check_kind(table, 'leaves')
+    compiled, config_hash = _compiled_and_hash(compiled)
+    written_for = metadata.get(_META_CONFIG)
+    if written_for and config_hash and written_for.decode() != config_hash:
+        raise ValueError("The leaf table was written for a different config.py.")
+    if table.num_rows != len(compiled.leaves):
+        raise ValueError(f"The leaf table has {table.num_rows} leaves; the config has {len(compiled.leaves)}.")
+
+    columns = amount_columns(periods_in_columns(table.column_names))
+    leaf_amounts = np.zeros((len(columns), len(compiled.leaves)))
+    leaf_ids = table.column('LeafId').to_numpy()
+    for period, column in enumerate(columns):
+        leaf_amounts[period, leaf_ids] = table.column(column).to_numpy()
+    return compiled.to_nested(*compiled.roll_up(leaf_amounts))
+
+
+def write_table(table, path):
+    """
+    Writes `table` as Parquet for a .parquet path, else as an uncompressed
+    Arrow IPC file (which reads back zero-copy from a memory map). The file
+    is written under a scratch name and renamed into place.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    scratch = path + '.part'
+    try:
+        if path.endswith('.parquet'):
+            pq.write_table(table, scratch)
+        else:
+            with pa.OSFile(scratch, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(scratch, path)
+    except BaseException:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+        raise
+
+
+def read_table(path):
+    """Reads a table written by write_table(), memory-mapping the file."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith('.parquet'):
+        return pq.read_table(path, memory_map=True)
+    # The table's buffers point into the map and keep it open while in use.
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def write_intake(path, intake_df, found_py_column):
+    write_table(intake_to_table(intake_df, found_py_column), path)
+
+
+def read_intake(path):
+    """Returns (intake_df, found_py_column) from an intake file."""
+    return intake_from_table(read_table(path))
+
+
+def write_leaves(path, aggregated_data, compiled=None):
+    write_table(leaves_to_table(aggregated_data, compiled), path)
+
+
+def read_leaves(path, compiled=None):
+    """Returns Agent 3's nested aggregated data from a leaf-table file."""
+    return aggregated_from_table(read_table(path), compiled)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("Usage: python -m financial_reporter_app.columnar <file.arrow|file.parquet>")
+        return 2
+    table = read_table(argv[0])
+    metadata = {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items()
+                if key.startswith(b'financial_reporter.')}
+    print(f"{argv[0]}: {table.num_rows} rows, {metadata}")
+    print(table.schema.remove_metadata())
+    print(table.slice(0, 10).to_pandas().to_string())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,334 @@
+# ==============================================================================
+# FILE: compiled_mapping.py
+# Compiles NOTES_STRUCTURE_AND_MAPPING once into flat lookup tables so that
+# Agent 3 can match source rows with hash lookups instead of alias scans.
+# ==============================================================================
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import numpy as np
+
+from .periods import period_keys
+
+
+def segment_sum(values, segment_ids, n_segments):
+    """
+    Sums the columns of `values` (periods x items) into `n_segments` segments
+    by `segment_ids` (one per item), for every period in one bincount: each
+    period's segments are offset into their own block of the output.
+    """
+    n_periods = values.shape[0]
+    offsets = np.arange(n_periods)[:, None] * n_segments
+    return np.bincount((np.asarray(segment_ids, dtype=np.int64) + offsets).ravel(), weights=values.ravel(),
+                       minlength=n_periods * n_segments).reshape(n_periods, n_segments)
+
+
+def freeze_mapping(node):
+    """
+    Returns a read-only copy of a notes structure: every dict becomes a
+    MappingProxyType and every alias list a tuple, so one instance can be
+    shared by all requests and threads without defensive copies.
+    """
+    if isinstance(node, Mapping):
+        return MappingProxyType({key: freeze_mapping(value) for key, value in node.items()})
+    if isinstance(node, list):
+        return tuple(freeze_mapping(value) for value in node)
+    return node
+
+
+# Frozen views by the id() of their source dict, as (source, frozen) pairs;
+# holding the source keeps its id from being reused. A few slots are enough
+# for config.py's dict, the config snapshot's copy of it and the odd custom
+# structure, without one evicting another.
+_frozen = {}
+_MAX_FROZEN = 8
+
+
+def get_frozen_mapping(notes_structure):
+    """
+    Returns the shared frozen view of `notes_structure`, freezing it on first
+    use. A dict equal to one frozen before (e.g. config.py's dict and the
+    config snapshot's unpickled copy) gets the same view, and so the same
+    compiled mapping.
+    """
+    if isinstance(notes_structure, MappingProxyType):
+        return notes_structure
+    entry = _frozen.get(id(notes_structure))
+    if entry is None:
+        frozen = next((view for source, view in _frozen.values() if source == notes_structure), None)
+        if frozen is None:
+            frozen = freeze_mapping(notes_structure)
+        if len(_frozen) >= _MAX_FROZEN:
+            del _frozen[next(iter(_frozen))]
+        entry = _frozen[id(notes_structure)] = (notes_structure, frozen)
+    return entry[1]
+
+
+class MappingOverlay(Mapping):
+    """
+    A small per-request layer on top of a shared, frozen notes structure.
+
+    It reads like the base structure, and carries any extra aliases found for
+    this request in `extra_aliases`, a dict of (note_num, path) -> alias list,
+    where `path` is the tuple of sub_items keys leading to the leaf. The base
+    structure itself is never copied or modified. `suggestions` records how
+    Agent 2 arrived at the extra aliases, for review.
+    """
+
+    def __init__(self, base, extra_aliases=None):
+        self.base = base
+        self.extra_aliases = extra_aliases or {}
+        self.suggestions = []
+
+    def add_alias(self, note_num, path, alias):
+        self.extra_aliases.setdefault((note_num, tuple(path)), []).append(alias)
+
+    def __getitem__(self, key):
+        return self.base[key]
+
+    def __iter__(self):
+        return iter(self.base)
+
+    def __len__(self):
+        return len(self.base)
+
+
+class CompiledMapping:
+    """
+    A precompiled, flat view of a notes structure.
+
+    Every section and leaf of every note's sub_items is a node, numbered in
+    template (pre-order) order:
+      - `nodes` holds each node's (note_num, path), where `path` is the tuple
+        of sub_items keys leading to it.
+      - `node_parent` holds the parent node id (-1 directly under a note),
+        `node_note` the note's index in `note_nums`, and `node_depth` the
+        length of the path.
+      - `node_children` lists a section's child ids; it is None for a leaf.
+    Leaves also get their own dense ids: `leaves` lists their (note_num, path)
+    and `leaf_nodes` their node ids, and `leaf_ids` maps back to the leaf id.
+    Since both are numbered in template order, the leaves under any node (or
+    note) form the contiguous id range [start, end) in `node_leaf_range` (or
+    `note_leaf_range`); `node_ids` maps a (note_num, path) to its node id.
+
+    `alias_index` maps each normalised alias to the ids of the leaves it
+    feeds. An alias that appears more than once (in one leaf or across leaves)
+    keeps every occurrence, so a lookup returns exactly the leaves the old
+    alias-by-alias scan would have hit.
+    """
+
+    def __init__(self, notes_structure):
+        self.notes_structure = notes_structure
+        self.note_nums, self.note_titles, self.note_children = [], [], []
+        self.nodes, self.node_children, parents, notes = [], [], [], []
+        self.leaves, leaf_nodes, leaf_ranges, note_leaf_ranges = [], [], [], []
+        self.alias_index = {}
+
+        def compile_level(note_index, template_node, path, parent):
+            child_ids = []
+            for key, value in template_node.items():
+                node_id = len(self.nodes)
+                child_ids.append(node_id)
+                self.nodes.append((self.note_nums[note_index], path + (key,)))
+                self.node_children.append(None)
+                parents.append(parent)
+                notes.append(note_index)
+                leaf_ranges.append(None)
+
+                if isinstance(value, Mapping):
+                    first_leaf = len(self.leaves)
+                    self.node_children[node_id] = compile_level(note_index, value, path + (key,), node_id)
+                    leaf_ranges[node_id] = (first_leaf, len(self.leaves))
+                    continue
+
+                leaf_id = len(self.leaves)
+                self.leaves.append(self.nodes[node_id])
+                leaf_nodes.append(node_id)
+                leaf_ranges[node_id] = (leaf_id, leaf_id + 1)
+                aliases = value if isinstance(value, (list, tuple)) else [value]
+                for alias in aliases:
+                    self.alias_index.setdefault(alias.lower().strip(), []).append(leaf_id)
+            return child_ids
+
+        for note_num, note_data in notes_structure.items():
+            if 'sub_items' in note_data:
+                self.note_nums.append(note_num)
+                self.note_titles.append(note_data.get('title', ''))
+                first_leaf = len(self.leaves)
+                self.note_children.append(compile_level(len(self.note_nums) - 1, note_data['sub_items'], (), -1))
+                note_leaf_ranges.append((first_leaf, len(self.leaves)))
+
+        self.node_parent = np.array(parents, dtype=np.int64)
+        self.node_note = np.array(notes, dtype=np.int64)
+        self.node_depth = np.array([len(path) for _, path in self.nodes], dtype=np.int64)
+        self.leaf_nodes = np.array(leaf_nodes, dtype=np.int64)
+        self.leaf_ids = {leaf: leaf_id for leaf_id, leaf in enumerate(self.leaves)}
+        self.node_ids = {node: node_id for node_id, node in enumerate(self.nodes)}
+        self.node_leaf_range = np.array(leaf_ranges, dtype=np.int64).reshape(-1, 2)
+        self.note_leaf_range = np.array(note_leaf_ranges, dtype=np.int64).reshape(-1, 2)
+
+        # Subtotals roll up one depth at a time, deepest first: the nodes at
+        # each depth below the top level, and their parents.
+        self.rollup_levels = []
+        for depth in range(int(self.node_depth.max(initial=0)), 1, -1):
+            at_depth = np.flatnonzero(self.node_depth == depth)
+            self.rollup_levels.append((at_depth, self.node_parent[at_depth]))
+        self.top_level_nodes = np.flatnonzero(self.node_parent == -1)
+
+        # Freeze the id lists so they can be shared safely between runs.
+        self.alias_index = {alias: tuple(ids) for alias, ids in self.alias_index.items()}
+        self._leaf_ancestors = {}
+
+    def match(self, data_key):
+        """
+        Returns the ids of every leaf whose aliases match a normalised
+        "Header|Particular" key. A match is either the whole key or any
+        suffix that follows a '|' (the old `endswith("|alias")` rule).
+        """
+        alias_index = self.alias_index
+        leaf_ids = list(alias_index.get(data_key, ()))
+        pos = data_key.find('|')
+        while pos != -1:
+            leaf_ids.extend(alias_index.get(data_key[pos + 1:], ()))
+            pos = data_key.find('|', pos + 1)
+        return leaf_ids
+
+    def __getstate__(self):
+        # The frozen structure can't be pickled (see config_snapshot.py); the
+        # loader re-attaches it.
+        state = dict(self.__dict__)
+        state['notes_structure'] = None
+        state['_leaf_ancestors'] = {}
+        return state
+
+    def leaf_ancestors(self, leaf_id):
+        """
+        The node ids from a leaf up to its top-level section, leaf first, as an
+        array of depth ids. Computed on first use and then cached.
+        """
+        ancestors = self._leaf_ancestors.get(leaf_id)
+        if ancestors is None:
+            chain, node_id = [], int(self.leaf_nodes[leaf_id])
+            while node_id != -1:
+                chain.append(node_id)
+                node_id = int(self.node_parent[node_id])
+            ancestors = self._leaf_ancestors[leaf_id] = np.array(chain, dtype=np.int64)
+        return ancestors
+
+    def roll_up(self, leaf_amounts):
+        """
+        Computes every subtotal from leaf amounts. `leaf_amounts` has one
+        contiguous row per period (row 0 is CY, row 1 is PY, and so on; see
+        periods.py) and one column per leaf. Returns (node_amounts,
+        note_amounts), shaped (periods, nodes) and (periods, notes). Each depth
+        is added into its parents, for all periods at once, with one segmented
+        sum (see segment_sum()).
+        """
+        n_periods, n_nodes = leaf_amounts.shape[0], len(self.nodes)
+        node_amounts = np.zeros((n_periods, n_nodes))
+        node_amounts[:, self.leaf_nodes] = leaf_amounts
+        for at_depth, parents in self.rollup_levels:
+            node_amounts += segment_sum(node_amounts[:, at_depth], parents, n_nodes)
+
+        top_notes = self.node_note[self.top_level_nodes]
+        note_amounts = segment_sum(node_amounts[:, self.top_level_nodes], top_notes, len(self.note_nums))
+        return node_amounts, note_amounts
+
+    def to_nested(self, node_amounts, note_amounts, note_indices=None):
+        """
+        Builds the nested {note: {'total', 'sub_items', 'title'}} dict that
+        Agents 4 and 5 expect from rolled-up amounts (see roll_up()). Amounts
+        are {period key: amount} dicts, e.g. {'CY': .., 'PY': ..}. Pass
+        `note_indices` (positions in `note_nums`) to build only those notes.
+        """
+        keys = period_keys(node_amounts.shape[0])
+        node_columns = node_amounts.T.tolist()
+        note_columns = note_amounts.T.tolist()
+
+        def build(child_ids):
+            data_node = {}
+            for node_id in child_ids:
+                key = self.nodes[node_id][1][-1]
+                grandchildren = self.node_children[node_id]
+                if grandchildren is None:
+                    data_node[key] = dict(zip(keys, node_columns[node_id]))
+                else:
+                    data_node[key] = build(grandchildren)
+                    data_node[key]['total'] = dict(zip(keys, node_columns[node_id]))
+            return data_node
+
+        aggregated_data = {}
+        for note_index in range(len(self.note_nums)) if note_indices is None else sorted(note_indices):
+            note_num = self.note_nums[note_index]
+            aggregated_data[note_num] = {
+                'total': dict(zip(keys, note_columns[note_index])),
+                'sub_items': build(self.note_children[note_index]),
+                'title': self.note_titles[note_index]
+            }
+        return aggregated_data
+
+
+class OverlaidCompiledMapping:
+    """
+    A CompiledMapping plus the extra aliases of a MappingOverlay. The shared
+    base index is consulted first, then a small index of the overlay aliases.
+    Aliases pointing at leaves that don't exist in the base are ignored. All
+    other attributes (node tables, roll_up, to_nested) come from the base.
+    """
+
+    def __init__(self, base, extra_aliases):
+        self.base = base
+        self.extra_index = {}
+        for leaf, aliases in extra_aliases.items():
+            leaf_id = base.leaf_ids.get(leaf)
+            if leaf_id is None:
+                continue
+            for alias in aliases:
+                self.extra_index.setdefault(alias.lower().strip(), []).append(leaf_id)
+
+    def __getattr__(self, name):
+        return getattr(self.base, name)
+
+    def match(self, data_key):
+        leaf_ids = self.base.match(data_key)
+        if self.extra_index:
+            leaf_ids.extend(self.extra_index.get(data_key, ()))
+            pos = data_key.find('|')
+            while pos != -1:
+                leaf_ids.extend(self.extra_index.get(data_key[pos + 1:], ()))
+                pos = data_key.find('|', pos + 1)
+        return leaf_ids
+
+
+# The most recently compiled structure, keyed by its frozen view. Raw dicts
+# are frozen first, so callers passing config.py's dict and callers passing
+# its frozen view share it; one slot is enough to compile it only once.
+_last_compiled = None
+
+
+def compile_mapping(notes_structure):
+    """
+    Returns the CompiledMapping for `notes_structure` (a dict or its frozen
+    view), reusing the last one if possible. A MappingOverlay reuses the
+    compiled form of its base structure.
+    """
+    global _last_compiled
+    if isinstance(notes_structure, MappingOverlay):
+        base = compile_mapping(notes_structure.base)
+        return OverlaidCompiledMapping(base, notes_structure.extra_aliases) if notes_structure.extra_aliases else base
+    notes_structure = get_frozen_mapping(notes_structure)
+    if _last_compiled is None or _last_compiled.notes_structure is not notes_structure:
+        _last_compiled = CompiledMapping(notes_structure)
+    return _last_compiled
+
+
+def adopt_compiled_mapping(compiled, notes_structure):
+    """
+    Makes an already compiled (e.g. unpickled) CompiledMapping the cached
+    compiled form of `notes_structure`, so that get_frozen_mapping() and
+    compile_mapping() return it without recompiling. Returns the frozen view.
+    """
+    global _last_compiled
+    compiled.notes_structure = get_frozen_mapping(notes_structure)
+    _last_compiled = compiled
+    return compiled.notes_structure
@@ -0,0 +1,129 @@
+# ==============================================================================
+# FILE: config_snapshot.py
+# A versioned, pickled snapshot of config.py (the notes structure, the master
+# template and the compiled mapping), so cold starts load it in milliseconds
+# instead of importing and compiling the config.
+# ==============================================================================
+import hashlib
+import importlib.util
+import os
+import pickle
+import sys
+import tempfile
+
+from .private_files import check_private, ensure_private_dir
+from .settings import CONFIG_SNAPSHOT_DIR
+
+# Bump when the snapshot layout or CompiledMapping's attributes change.
+SNAPSHOT_VERSION = 1
+
+
+class ConfigSnapshot:
+    """
+    The pipeline's view of config.py:
+      - `notes_structure`: NOTES_STRUCTURE_AND_MAPPING (a plain dict);
+      - `master_template`: MASTER_TEMPLATE;
+      - `compiled`: the CompiledMapping of the frozen notes structure;
+      - `source_hash`: SHA-256 of config.py, which identifies the snapshot.
+    """
+
+    def __init__(self, notes_structure, master_template, compiled, source_hash):
+        self.notes_structure = notes_structure
+        self.master_template = master_template
+        self.compiled = compiled
+        self.source_hash = source_hash
+
+
+def config_source_hash():
+    """SHA-256 of config.py's bytes, found without importing it (None if it has no source file)."""
+    spec = importlib.util.find_spec('config')
+    if spec is None or not spec.origin or not os.path.isfile(spec.origin):
+        return None
+    with open(spec.origin, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _snapshot_path(source_hash):
+    # numpy arrays pickle per numpy major version, so it is part of the name.
+    import numpy as np
+
+    tag = f"v{SNAPSHOT_VERSION}-py{sys.version_info[0]}{sys.version_info[1]}-np{np.__version__.split('.')[0]}"
+    return os.path.join(CONFIG_SNAPSHOT_DIR, f"config-{source_hash[:32]}-{tag}.pickle")
+
+
+def _compile_config(source_hash):
+    from config import MASTER_TEMPLATE, NOTES_STRUCTURE_AND_MAPPING
+
+    from .compiled_mapping import compile_mapping, get_frozen_mapping
+
+    compiled = compile_mapping(get_frozen_mapping(NOTES_STRUCTURE_AND_MAPPING))
+    return ConfigSnapshot(NOTES_STRUCTURE_AND_MAPPING, MASTER_TEMPLATE, compiled, source_hash)
+
+
+def _load_snapshot(path, source_hash):
+    from .compiled_mapping import adopt_compiled_mapping
+
+    try:
+        if not os.path.exists(path):
+            return None
+        # Unpickling runs code: only load a snapshot nobody else can have written.
+        check_private(os.path.dirname(path))
+        with open(path, 'rb') as f:
+            check_private(path, f.fileno())
+            data = pickle.load(f)
+    except PermissionError as e:
+        print(f"⚠️  Config snapshot ignored: {e}")
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if data.get('version') != SNAPSHOT_VERSION or data.get('source_hash') != source_hash:
+        return None
+    adopt_compiled_mapping(data['compiled'], data['notes_structure'])
+    return ConfigSnapshot(data['notes_structure'], data['master_template'], data['compiled'], source_hash)
+
+
+def _write_snapshot(path, snapshot):
+    data = {'version': SNAPSHOT_VERSION, 'source_hash': snapshot.source_hash,
+            'notes_structure': snapshot.notes_structure, 'master_template': snapshot.master_template,
+            'compiled': snapshot.compiled}
+    ensure_private_dir(os.path.dirname(path))
+    # Write to a scratch file and rename it into place, so concurrently
+    # starting workers never read a half-written snapshot.
+    fd, scratch = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(scratch, path)
+    except BaseException:
+        os.remove(scratch)
+        raise
+
+
+_snapshot = None
+
+
+def get_config_snapshot():
+    """
+    Returns the process-wide ConfigSnapshot. It is loaded from
+    settings.CONFIG_SNAPSHOT_DIR when a snapshot for the current config.py
+    exists and is private to the current user; otherwise config.py is
+    imported and compiled, and the snapshot is written for the next
+    process. Any edit to config.py changes its hash, so a stale snapshot is
+    never used.
+    """
+    global _snapshot
+    if _snapshot is None:
+        source_hash = config_source_hash()
+        if not CONFIG_SNAPSHOT_DIR or source_hash is None:
+            _snapshot = _compile_config(source_hash)
+            return _snapshot
+
+        path = _snapshot_path(source_hash)
+        _snapshot = _load_snapshot(path, source_hash)
+        if _snapshot is None:
+            _snapshot = _compile_config(source_hash)
+            try:
+                _write_snapshot(path, _snapshot)
+            except OSError as e:
+                print(f"⚠️  Config snapshot not written ({e}); the next start will compile config.py again.")
+    return _snapshot
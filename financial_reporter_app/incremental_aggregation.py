@@ -0,0 +1,122 @@
+# ==============================================================================
+# FILE: incremental_aggregation.py
+# Keeps an aggregation live while a reviewer edits amounts or remaps rows, so
+# each edit touches only one leaf's ancestors instead of the whole tree.
+# ==============================================================================
+import numpy as np
+
+from .agents.agent_3_aggregator import build_data_lookup, resolve_row_leaves
+from .compiled_mapping import compile_mapping
+from .mapping_store import get_mapping_store
+from .periods import MIN_PERIODS, periods_in_columns
+
+
+class IncrementalAggregation:
+    """
+    The aggregated tree of one trial balance plus each row's leaf assignment.
+
+    Rows are identified by their normalised "Header|Particular" key, the same
+    unit Agent 3 aggregates. Every edit (set_row, remove_row, remap_row)
+    applies the change in amount to the affected leaves, their ancestor
+    subtotals and their note totals, which is O(depth) per leaf. Each edit
+    returns the note numbers whose figures changed, so Agents 4 and 5 only
+    need to redo those (see refresh()).
+
+    Totals are kept by adding and subtracting. After a long session of edits,
+    rebuild() recomputes them from the leaf amounts if exact sums matter.
+    """
+
+    def __init__(self, source_df, notes_structure, mapping_store=None):
+        self.compiled = compile_mapping(notes_structure)
+        self.mapping_store = mapping_store if mapping_store is not None else get_mapping_store()
+
+        data_lookup = build_data_lookup(source_df)
+        row_leaves = resolve_row_leaves(list(data_lookup), self.compiled, self.mapping_store)
+        self.rows = {
+            data_key: (np.array(amounts, dtype=np.float64), tuple(leaf_ids))
+            for (data_key, amounts), leaf_ids in zip(data_lookup.items(), row_leaves)
+        }
+
+        self.n_periods = max(periods_in_columns(source_df.columns), MIN_PERIODS)
+        self.leaf_amounts = np.zeros((self.n_periods, len(self.compiled.leaves)))
+        for amounts, leaf_ids in self.rows.values():
+            for leaf_id in leaf_ids:
+                self.leaf_amounts[:, leaf_id] += amounts
+        self.rebuild()
+
+    def rebuild(self):
+        """Recomputes every subtotal and note total from the leaf amounts."""
+        self.node_amounts, self.note_amounts = self.compiled.roll_up(self.leaf_amounts)
+
+    def _shift(self, leaf_ids, delta, changed_notes):
+        if not delta.any():
+            return
+        compiled = self.compiled
+        for leaf_id in leaf_ids:
+            ancestors = compiled.leaf_ancestors(leaf_id)
+            self.leaf_amounts[:, leaf_id] += delta
+            self.node_amounts[:, ancestors] += delta[:, None]
+            note_index = compiled.node_note[ancestors[0]]
+            self.note_amounts[:, note_index] += delta
+            changed_notes.add(compiled.note_nums[note_index])
+
+    def set_row(self, particular, *amounts):
+        """
+        Sets a row's amounts, one per period (CY, PY, ...); periods left out
+        are 0. A row that isn't there yet is added and matched like Agent 3
+        would match it. Returns the changed note numbers.
+        """
+        if len(amounts) > self.n_periods:
+            raise ValueError(f"{len(amounts)} amounts given; the aggregation has {self.n_periods} periods.")
+        data_key = str(particular).lower().strip()
+        amounts = np.array(amounts + (0,) * (self.n_periods - len(amounts)), dtype=np.float64)
+        changed_notes = set()
+        if data_key in self.rows:
+            old_amounts, leaf_ids = self.rows[data_key]
+            self._shift(leaf_ids, amounts - old_amounts, changed_notes)
+        else:
+            leaf_ids = tuple(resolve_row_leaves([data_key], self.compiled, self.mapping_store)[0])
+            self._shift(leaf_ids, amounts, changed_notes)
+        self.rows[data_key] = (amounts, leaf_ids)
+        return changed_notes
+
+    def remove_row(self, particular):
+        """Removes a row and its amounts. Returns the changed note numbers."""
+        data_key = str(particular).lower().strip()
+        amounts, leaf_ids = self.rows.pop(data_key)
+        changed_notes = set()
+        self._shift(leaf_ids, -amounts, changed_notes)
+        return changed_notes
+
+    def remap_row(self, particular, leaves):
+        """
+        Moves a row to the given leaves, each a (note_num, path) pair; an empty
+        list leaves it unmatched. Returns the changed note numbers.
+        """
+        data_key = str(particular).lower().strip()
+        amounts, old_leaf_ids = self.rows[data_key]
+        new_leaf_ids = []
+        for leaf in leaves:
+            note_num, path = leaf
+            leaf_id = self.compiled.leaf_ids.get((note_num, tuple(path)))
+            if leaf_id is None:
+                raise KeyError(f"No leaf {path} in Note {note_num}")
+            new_leaf_ids.append(leaf_id)
+
+        changed_notes = set()
+        self._shift(old_leaf_ids, -amounts, changed_notes)
+        self._shift(new_leaf_ids, amounts, changed_notes)
+        self.rows[data_key] = (amounts, tuple(new_leaf_ids))
+        return changed_notes
+
+    def to_nested(self, note_nums=None):
+        """The nested dict Agents 4 and 5 expect, for all notes or only `note_nums`."""
+        note_indices = None
+        if note_nums is not None:
+            note_indices = [self.compiled.note_nums.index(note_num) for note_num in note_nums]
+        return self.compiled.to_nested(self.node_amounts, self.note_amounts, note_indices)
+
+    def refresh(self, aggregated_data, changed_notes):
+        """Rebuilds only `changed_notes` in an existing nested dict, in place, and returns it."""
+        aggregated_data.update(self.to_nested(changed_notes))
+        return aggregated_data
@@ -0,0 +1,135 @@
+# ==============================================================================
+# FILE: instrumentation.py
+# Per-stage timing and memory records for the five agents, written as JSON
+# lines. Controlled by settings.METRICS_OUTPUT (env FINREPORT_METRICS):
+#   unset/empty  -> off; the decorator returns the agent function untouched
+#   "-"          -> records go to stderr
+#   anything else-> records are appended to that file
+# ==============================================================================
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from .settings import METRICS_OUTPUT
+
+ENABLED = bool(METRICS_OUTPUT)
+
+_write_lock = threading.Lock()
+_active = threading.local()
+
+# tracemalloc's peak is process-wide, and every stage resets it when it
+# starts. Before each reset (and when a stage ends) the peak so far is folded
+# into the running peak of every stage still open, on any thread, so an inner
+# or overlapping stage never hides an outer stage's peak.
+_peak_lock = threading.Lock()
+_open_peaks = {}
+_started_tracing = False
+
+
+def _fold_peak():
+    # Call with _peak_lock held.
+    peak = tracemalloc.get_traced_memory()[1]
+    for token, open_peak in _open_peaks.items():
+        _open_peaks[token] = max(open_peak, peak)
+
+
+def _start_peak(token):
+    global _started_tracing
+    with _peak_lock:
+        if not _open_peaks and not tracemalloc.is_tracing():
+            # Tracing started by someone else (e.g. a benchmark) is left running.
+            tracemalloc.start()
+            _started_tracing = True
+        _fold_peak()
+        tracemalloc.reset_peak()
+        _open_peaks[token] = 0
+
+
+def _finish_peak(token):
+    """The stage's peak traced memory; stops tracing started here once no stage is open."""
+    global _started_tracing
+    with _peak_lock:
+        _fold_peak()
+        peak = _open_peaks.pop(token)
+        if not _open_peaks and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+        return peak
+
+
+def _emit(record):
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        if METRICS_OUTPUT == '-':
+            print(line, file=sys.stderr, flush=True)
+        else:
+            with open(METRICS_OUTPUT, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+def annotate(**fields):
+    """
+    Adds fields (e.g. match counts) to the record of the stage currently
+    running on this thread. Does nothing when instrumentation is off.
+    """
+    if ENABLED:
+        stack = getattr(_active, 'stack', None)
+        if stack:
+            stack[-1].update(fields)
+
+
+def instrument_stage(stage, rows_in=None, rows_out=None):
+    """
+    Decorates an agent so that each call emits one JSON record with its wall
+    time, CPU time, peak traced memory (tracemalloc) and row counts.
+    `rows_in` is called with the agent's arguments and `rows_out` with its
+    result; either may return None. When instrumentation is off, the function
+    is returned as-is, so there is no per-call overhead at all.
+
+    The peak covers everything traced while the stage ran. It includes the
+    stages nested in it, and on other threads any stage overlapping it, so
+    concurrent stages each see at least the process's peak over their span.
+    """
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            record = {'stage': stage, 'function': func.__name__, 'pid': os.getpid(), 'started_at': time.time()}
+            if rows_in is not None:
+                # Like rows_out below: a counting error must never fail the stage.
+                try:
+                    record['rows_in'] = rows_in(*args, **kwargs)
+                except Exception:
+                    record['rows_in'] = None
+
+            token = object()
+            _start_peak(token)
+            stack = getattr(_active, 'stack', None)
+            if stack is None:
+                stack = _active.stack = []
+            stack.append(record)
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                record['wall_s'] = round(time.perf_counter() - wall_start, 6)
+                record['cpu_s'] = round(time.process_time() - cpu_start, 6)
+                record['peak_mem_bytes'] = _finish_peak(token)
+                stack.pop()
+                if rows_out is not None:
+                    try:
+                        record['rows_out'] = rows_out(result)
+                    except Exception:
+                        record['rows_out'] = None
+                _emit(record)
+
+        return wrapper
+    return decorate
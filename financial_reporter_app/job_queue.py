@@ -0,0 +1,210 @@
+# ==============================================================================
+# FILE: job_queue.py
+# Durable queue of report jobs in SQLite (WAL mode). Each job keeps its own
+# copy of the upload and the name of its last completed stage, so a job
+# survives crashes and restarts and resumes where it stopped.
+# ==============================================================================
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from .settings import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_QUEUE_PATH, JOB_RETRY_BACKOFF_SECONDS, JOB_STORE_DIR
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id             TEXT PRIMARY KEY,
+    company        TEXT NOT NULL,
+    upload_path    TEXT NOT NULL,
+    report_path    TEXT NOT NULL,
+    status         TEXT NOT NULL,
+    stage          TEXT,
+    attempts       INTEGER NOT NULL DEFAULT 0,
+    lease_owner    TEXT,
+    lease_expires  REAL,
+    next_run_at    REAL NOT NULL,
+    error          TEXT,
+    summary        TEXT,
+    created_at     REAL NOT NULL,
+    updated_at     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, next_run_at);
+"""
+
+_COLUMNS = ['id', 'company', 'upload_path', 'report_path', 'status', 'stage', 'attempts', 'lease_owner',
+            'lease_expires', 'next_run_at', 'error', 'summary', 'created_at', 'updated_at']
+
+
+def _row_to_job(row):
+    job = dict(zip(_COLUMNS, row))
+    job['summary'] = json.loads(job['summary']) if job['summary'] else None
+    return job
+
+
+class JobQueue:
+    """
+    Jobs move from 'queued' to 'running' when a worker claims them, then to
+    'done' or 'failed'. A claim is a lease: the worker must renew it (any
+    checkpoint() or renew() call does) within `lease_seconds`, or another
+    worker may claim the job and resume it from its last checkpointed stage.
+
+    A failed attempt is retried after `retry_backoff` seconds, doubled on
+    every further attempt, until `max_attempts` attempts were made; an
+    attempt whose lease expired (the worker crashed) counts too.
+
+    Every state change is one short BEGIN IMMEDIATE transaction, so any
+    number of worker processes can share the queue file.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH, store_dir=JOB_STORE_DIR, lease_seconds=JOB_LEASE_SECONDS,
+                 max_attempts=JOB_MAX_ATTEMPTS, retry_backoff=JOB_RETRY_BACKOFF_SECONDS):
+        self.path = path
+        self.store_dir = store_dir
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.makedirs(store_dir, exist_ok=True)
+        # Workers wait for each other's short write transactions rather than fail.
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def job_dir(self, job_id):
+        """The directory holding a job's upload, checkpoints and (by default) report."""
+        return os.path.join(self.store_dir, job_id)
+
+    def submit(self, file_object, company_name, filename=None, report_path=None):
+        """
+        Copies the upload (a path or a file object) into the job store and
+        queues a job for it. `filename` supplies the upload's extension when
+        `file_object` has no name; `report_path` defaults to report.xlsx in the
+        job directory. Returns the job id.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = self.job_dir(job_id)
+        name = filename or (file_object if isinstance(file_object, (str, os.PathLike)) else getattr(file_object, 'name', '')) or ''
+        extension = os.path.splitext(str(name))[1].lower() or '.xlsx'
+        upload_path = os.path.join(job_dir, f"upload{extension}")
+        os.makedirs(job_dir)
+        try:
+            if isinstance(file_object, (str, os.PathLike)):
+                shutil.copyfile(file_object, upload_path)
+            else:
+                file_object.seek(0)
+                with open(upload_path, 'wb') as f:
+                    shutil.copyfileobj(file_object, f)
+                file_object.seek(0)
+            now = time.time()
+            with self._lock, self._conn:
+                self._conn.execute('BEGIN IMMEDIATE')
+                self._conn.execute(
+                    "INSERT INTO jobs (id, company, upload_path, report_path, status, next_run_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, company_name, upload_path, report_path or os.path.join(job_dir, 'report.xlsx'), now, now, now))
+        except BaseException:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        return job_id
+
+    def claim(self, worker_id):
+        """
+        Leases the oldest runnable job to `worker_id` and returns it as a dict,
+        or returns None if nothing is runnable. Runnable means queued and due,
+        or running under an expired lease; an expired job that has used up its
+        attempts is marked failed instead.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires = NULL, updated_at = ?, "
+                "error = COALESCE(error || ' | ', '') || 'The worker stopped responding on its last attempt.' "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?", (now, now, self.max_attempts))
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE (status = 'queued' AND next_run_at <= ?) "
+                "OR (status = 'running' AND lease_expires < ?) ORDER BY next_run_at, created_at LIMIT 1", (now, now)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?", (worker_id, now + self.lease_seconds, now, row[0]))
+            return _row_to_job(self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", row).fetchone())
+
+    def _update_leased(self, job_id, worker_id, assignments, params):
+        # Only the current lease holder may change a running job; returns
+        # False when the lease was lost (expired and claimed by another worker).
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND status = 'running' AND lease_owner = ?",
+                (*params, time.time(), job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def renew(self, job_id, worker_id):
+        """Extends the lease; returns False if `worker_id` no longer holds it."""
+        return self._update_leased(job_id, worker_id, 'lease_expires = ?', (time.time() + self.lease_seconds,))
+
+    def checkpoint(self, job_id, worker_id, stage):
+        """Records `stage` as completed (its output is saved) and renews the lease."""
+        return self._update_leased(job_id, worker_id, 'stage = ?, lease_expires = ?', (stage, time.time() + self.lease_seconds))
+
+    def complete(self, job_id, worker_id, summary=None):
+        """Marks the job done with a JSON-able summary."""
+        return self._update_leased(job_id, worker_id, "status = 'done', lease_owner = NULL, lease_expires = NULL, summary = ?",
+                                   (json.dumps(summary) if summary is not None else None,))
+
+    def fail(self, job_id, worker_id, error, retry=True):
+        """
+        Records a failed attempt. The job is queued again after the backoff
+        delay, unless `retry` is False or it has used up its attempts, in
+        which case it is marked failed.
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT attempts FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        attempts = row[0] if row else self.max_attempts
+        if retry and attempts < self.max_attempts:
+            delay = self.retry_backoff * 2 ** (attempts - 1)
+            return self._update_leased(job_id, worker_id, "status = 'queued', lease_owner = NULL, lease_expires = NULL, "
+                                       "next_run_at = ?, error = ?", (time.time() + delay, error))
+        return self._update_leased(job_id, worker_id, "status = 'failed', lease_owner = NULL, lease_expires = NULL, error = ?", (error,))
+
+    def get(self, job_id):
+        """The job as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def jobs(self, status=None, limit=100):
+        """The most recent jobs, newest first, optionally only those with `status`."""
+        query = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        params = ()
+        if status:
+            query, params = query + ' WHERE status = ?', (status,)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY created_at DESC LIMIT ?', (*params, limit)).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def counts(self):
+        """{status: number of jobs}."""
+        with self._lock:
+            return dict(self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def pending(self):
+        """Number of jobs still to be finished (queued or running)."""
+        counts = self.counts()
+        return counts.get('queued', 0) + counts.get('running', 0)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_job_queue():
+    """Opens the queue at settings.JOB_QUEUE_PATH; each process (worker) should open its own."""
+    return JobQueue(JOB_QUEUE_PATH)
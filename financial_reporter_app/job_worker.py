@@ -0,0 +1,254 @@
+# ==============================================================================
+# FILE: job_worker.py
+# Worker processes for the durable job queue (see job_queue.py). Each job is
+# run in three checkpointed steps (intake, analysis, report), so a job picked
+# up again after a crash skips the steps that already finished. Step outputs
+# are columnar files (see columnar.py) that any worker can memory-map.
+#
+# Usage (from the repository root):
+#   python -m financial_reporter_app.job_worker submit tb.xlsx --company "Acme Ltd"
+#   python -m financial_reporter_app.job_worker work --workers 4
+#   python -m financial_reporter_app.job_worker work --workers 4 --drain
+#   python -m financial_reporter_app.job_worker status [job_id]
+# ==============================================================================
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from .columnar import read_intake, read_leaves, write_intake, write_leaves
+from .job_queue import get_job_queue
+from .pipeline import run_analysis_stages, run_intake_stage, run_report_stage, warm_up
+
+# Checkpointed steps, in order; a job's `stage` is the last one completed.
+CHECKPOINTS = ('intake', 'analysis', 'report')
+POLL_SECONDS = 1.0
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker claimed it; this worker must drop the job."""
+
+
+class _Heartbeat:
+    """Renews a job's lease from a background thread while a long stage runs."""
+
+    def __init__(self, queue, job_id, worker_id):
+        self.queue, self.job_id, self.worker_id = queue, job_id, worker_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            if not self.queue.renew(self.job_id, self.worker_id):
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _write_json(path, data):
+    with open(path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(path + '.part', path)
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _checkpoint(queue, job_id, worker_id, stage):
+    if not queue.checkpoint(job_id, worker_id, stage):
+        raise LeaseLost(job_id)
+
+
+def process_job(queue, job, worker_id):
+    """
+    Runs one claimed job from the step after its last checkpoint, saving
+    each step's output in the job directory before recording the checkpoint.
+    Returns the job's new status: 'done', 'queued' (to be retried), 'failed'
+    or 'lost' (the lease went to another worker).
+    """
+    job_id, stage = job['id'], job['stage']
+    job_dir = queue.job_dir(job_id)
+    intake_path = os.path.join(job_dir, 'intake.arrow')
+    leaves_path = os.path.join(job_dir, 'leaves.arrow')
+    analysis_path = os.path.join(job_dir, 'analysis.json')
+    timings = {}
+    try:
+        with _Heartbeat(queue, job_id, worker_id) as heartbeat:
+            if stage is None:
+                intake_df, found_py_column = run_intake_stage(job['upload_path'], timings)
+                if intake_df is None:
+                    # An unreadable workbook stays unreadable; don't retry it.
+                    queue.fail(job_id, worker_id, "The workbook could not be read.", retry=False)
+                    return 'failed'
+                write_intake(intake_path, intake_df, found_py_column)
+                _write_json(os.path.join(job_dir, 'intake.json'), {'timings': timings})
+                _checkpoint(queue, job_id, worker_id, 'intake')
+                stage = 'intake'
+
+            if stage == 'intake':
+                intake_df, found_py_column = read_intake(intake_path)
+                timings = {**_read_json(os.path.join(job_dir, 'intake.json'))['timings'], **timings}
+                aggregated_data, provenance, _, warnings = run_analysis_stages(intake_df, timings)
+                write_leaves(leaves_path, aggregated_data)
+                _write_json(analysis_path, {
+                    'warnings': warnings, 'provenance': provenance.to_dict(), 'unmatched_rows': len(provenance.unmatched_rows),
+                    'found_py_column': found_py_column, 'timings': timings})
+                _checkpoint(queue, job_id, worker_id, 'analysis')
+                stage = 'analysis'
+
+            analysis = _read_json(analysis_path)
+            timings = {**analysis['timings'], **timings}
+            if stage == 'analysis':
+                scratch_path = job['report_path'] + '.part'
+                if run_report_stage(read_leaves(leaves_path), job['company'], timings, scratch_path) is None:
+                    if os.path.exists(scratch_path):
+                        os.remove(scratch_path)
+                    raise RuntimeError("The report could not be rendered.")
+                os.replace(scratch_path, job['report_path'])
+                _checkpoint(queue, job_id, worker_id, 'report')
+
+            if heartbeat.lost:
+                raise LeaseLost(job_id)
+            summary = {'report_path': job['report_path'], 'warnings': analysis['warnings'],
+                       'found_py_column': analysis['found_py_column'], 'unmatched_rows': analysis['unmatched_rows'],
+                       'timings': {name: round(seconds, 4) for name, seconds in timings.items()}}
+            if not queue.complete(job_id, worker_id, summary):
+                raise LeaseLost(job_id)
+            return 'done'
+    except LeaseLost:
+        print(f"⚠️  Worker {worker_id}: lost the lease on job {job_id}; another worker has it now.")
+        return 'lost'
+    except Exception as e:
+        queue.fail(job_id, worker_id, f"{type(e).__name__}: {e}")
+        job = queue.get(job_id)
+        return job['status'] if job else 'failed'
+
+
+def work(stop=None, drain=False, worker_id=None, poll_interval=POLL_SECONDS):
+    """
+    Claims and runs jobs until `stop` (an Event) is set, or, with `drain`,
+    until no job is queued or running. Returns the number of jobs processed.
+    """
+    queue = get_job_queue()
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    warm_up()
+    processed = 0
+    try:
+        while not (stop and stop.is_set()):
+            job = queue.claim(worker_id)
+            if job is None:
+                if drain and not queue.pending():
+                    break
+                if stop:
+                    stop.wait(poll_interval)
+                else:
+                    time.sleep(poll_interval)
+                continue
+            resumed = f", resuming after '{job['stage']}'" if job['stage'] else ''
+            print(f"\n--- Worker {worker_id}: Job {job['id']} for {job['company']} (attempt {job['attempts']}{resumed})... ---")
+            status = process_job(queue, job, worker_id)
+            print(f"--- Worker {worker_id}: Job {job['id']} {status}. ---")
+            processed += 1
+    finally:
+        queue.close()
+    return processed
+
+
+def _worker_process(stop, drain):
+    # The parent turns Ctrl+C into `stop`; workers finish their current job.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(stop, drain)
+
+
+def run_workers(workers=1, drain=False):
+    """
+    Runs `workers` worker processes (in-process for 1) until SIGINT/SIGTERM,
+    or until the queue is drained with `drain`. Throughput scales with the
+    worker count up to the number of CPUs.
+    """
+    if workers <= 1:
+        stop = threading.Event()
+    else:
+        stop = multiprocessing.Event()
+    previous = {signum: signal.signal(signum, lambda *_: stop.set()) for signum in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        if workers <= 1:
+            work(stop, drain)
+            return
+        processes = [multiprocessing.Process(target=_worker_process, args=(stop, drain)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def _print_job(job):
+    print(f"{job['id']}  {job['status']:<8} stage={job['stage'] or '-':<9} attempts={job['attempts']}  {job['company']}")
+    if job['error']:
+        print(f"   Error: {job['error']}")
+    if job['status'] == 'done':
+        print(f"   Report: {job['report_path']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Submit report jobs to the durable queue and run its workers.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    submit = commands.add_parser('submit', help="Queue a workbook.")
+    submit.add_argument('workbook', help="Path of the trial-balance workbook.")
+    submit.add_argument('--company', required=True, help="Company name for the report.")
+    submit.add_argument('--report', help="Where to write the report (default: in the job directory).")
+    work_parser = commands.add_parser('work', help="Run worker processes.")
+    work_parser.add_argument('-w', '--workers', type=int, default=1, help="Worker processes (default: 1).")
+    work_parser.add_argument('--drain', action='store_true', help="Exit once no job is queued or running.")
+    status = commands.add_parser('status', help="Show jobs.")
+    status.add_argument('job_id', nargs='?', help="Show one job (default: the most recent jobs).")
+    args = parser.parse_args(argv)
+
+    if args.command == 'work':
+        print(f"\n--- Job workers: Starting {args.workers} worker(s)... ---")
+        run_workers(args.workers, args.drain)
+        return 0
+
+    queue = get_job_queue()
+    try:
+        if args.command == 'submit':
+            report_path = os.path.abspath(args.report) if args.report else None
+            job_id = queue.submit(args.workbook, args.company, report_path=report_path)
+            print(f"✅ Job QUEUED: {job_id}")
+            return 0
+        if args.job_id:
+            job = queue.get(args.job_id)
+            if job is None:
+                print(f"❌ No job {args.job_id!r}.")
+                return 1
+            _print_job(job)
+            return 0
+        print(f"Jobs: {queue.counts()}")
+        for job in queue.jobs():
+            _print_job(job)
+        return 0
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
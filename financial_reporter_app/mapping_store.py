@@ -0,0 +1,174 @@
+# ==============================================================================
+# FILE: mapping_store.py
+# Persistent store of reviewer-confirmed mappings (particular -> note leaf),
+# kept in SQLite and fronted by an in-process LRU, so corrections survive the
+# session and recurring clients resolve with one hash lookup per row.
+# ==============================================================================
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .settings import MAPPING_STORE_CACHE_SIZE, MAPPING_STORE_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mappings (
+    particular  TEXT PRIMARY KEY,
+    note        TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    source      TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name   TEXT PRIMARY KEY,
+    value  INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('revision', 0);
+"""
+
+# SQLite's default limit on host parameters per statement is 999.
+_QUERY_CHUNK = 900
+
+_MISSING = object()
+
+
+def normalise_particular(text):
+    """Lower-cases and collapses runs of whitespace, so spacing differences don't split a mapping."""
+    return ' '.join(str(text).lower().split())
+
+
+class MappingStore:
+    """
+    Confirmed mappings keyed by normalised particular text. Each maps to one
+    leaf, given as (note_num, path) with `path` the tuple of sub_items keys.
+
+    Lookups go through an LRU of up to `cache_size` entries. Misses are
+    cached as well, so a row with no confirmed mapping costs one dict lookup
+    after the first time it is seen. Writes from other connections (e.g.
+    other batch workers) are noticed through SQLite's data_version and clear
+    the LRU.
+    """
+
+    def __init__(self, path, cache_size=MAPPING_STORE_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self):
+        return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _remember(self, particular, leaf):
+        self._cache[particular] = leaf
+        self._cache.move_to_end(particular)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def lookup_many(self, particulars):
+        """
+        Returns {normalised particular: (note_num, path)} for every given
+        particular that has a confirmed mapping. Particulars not in the LRU are
+        fetched from SQLite in a few IN queries.
+        """
+        with self._lock:
+            data_version = self._read_data_version()
+            if data_version != self._data_version:
+                self._cache.clear()
+                self._data_version = data_version
+
+            found, missing = {}, []
+            for particular in dict.fromkeys(normalise_particular(p) for p in particulars):
+                leaf = self._cache.get(particular, _MISSING)
+                if leaf is _MISSING:
+                    missing.append(particular)
+                    continue
+                self._cache.move_to_end(particular)
+                if leaf is not None:
+                    found[particular] = leaf
+
+            for start in range(0, len(missing), _QUERY_CHUNK):
+                chunk = missing[start:start + _QUERY_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT particular, note, path FROM mappings WHERE particular IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                stored = {particular: (note, tuple(json.loads(path))) for particular, note, path in rows}
+                for particular in chunk:
+                    leaf = stored.get(particular)
+                    self._remember(particular, leaf)
+                    if leaf is not None:
+                        found[particular] = leaf
+            return found
+
+    def lookup(self, particular):
+        """Returns the confirmed (note_num, path) for one particular, or None."""
+        return self.lookup_many([particular]).get(normalise_particular(particular))
+
+    def confirm(self, particular, note_num, path, source='reviewer'):
+        """Records (or replaces) the mapping of `particular` to the leaf (note_num, path)."""
+        self.confirm_many([(particular, note_num, path)], source)
+
+    def confirm_many(self, mappings, source='reviewer'):
+        """Records many (particular, note_num, path) mappings in one transaction."""
+        now = time.time()
+        rows = [(normalise_particular(particular), str(note_num), json.dumps(list(path)), source, now)
+                for particular, note_num, path in mappings]
+        with self._lock:
+            with self._conn:
+                self._conn.execute('BEGIN IMMEDIATE')
+                self._conn.executemany(
+                    "INSERT INTO mappings (particular, note, path, source, updated_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(particular) DO UPDATE SET note = excluded.note, path = excluded.path, "
+                    "source = excluded.source, updated_at = excluded.updated_at", rows)
+                self._conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'revision'")
+            for particular, note_num, path, _, _ in rows:
+                self._remember(particular, (note_num, tuple(json.loads(path))))
+            self._data_version = self._read_data_version()
+
+    def forget(self, particular):
+        """Removes the confirmed mapping of `particular`, if any."""
+        particular = normalise_particular(particular)
+        with self._lock:
+            with self._conn:
+                self._conn.execute('BEGIN IMMEDIATE')
+                self._conn.execute('DELETE FROM mappings WHERE particular = ?', (particular,))
+                self._conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'revision'")
+            self._remember(particular, None)
+            self._data_version = self._read_data_version()
+
+    def revision(self):
+        """A counter bumped by every write, used to key cached results."""
+        with self._lock:
+            return self._conn.execute("SELECT value FROM meta WHERE name = 'revision'").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_store = None
+
+
+def get_mapping_store():
+    """
+    Returns the process-wide store at settings.MAPPING_STORE_PATH, or None if
+    the store is disabled or cannot be opened (e.g. an unwritable home
+    directory; reported once), in which case only config.py's aliases apply.
+    """
+    global _default_store
+    if not MAPPING_STORE_PATH:
+        return None
+    if _default_store is None:
+        try:
+            _default_store = MappingStore(MAPPING_STORE_PATH)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  Mapping store unavailable ({e}); using config.py's aliases only.")
+            _default_store = False
+    return _default_store or None
@@ -0,0 +1,71 @@
+# ==============================================================================
+# FILE: periods.py
+# The reporting periods every amount is carried for: the current period
+# first, then each comparative period further back. Each stage holds its
+# amounts as one array row per period, so any number of periods is handled
+# in the same pass; this module names the periods and labels them.
+# ==============================================================================
+import calendar
+import datetime
+
+from .settings import PERIOD_END, PERIOD_MONTHS
+
+# Reports always show at least the current and the previous period; a
+# workbook without comparative figures reports zero for the previous one.
+MIN_PERIODS = 2
+
+
+def period_key(period):
+    """The key of period `period` (0 is current) in the nested data: 'CY', 'PY', then 'PY2', 'PY3', ..."""
+    if period == 0:
+        return 'CY'
+    return 'PY' if period == 1 else f'PY{period}'
+
+
+def period_keys(n_periods):
+    return [period_key(period) for period in range(n_periods)]
+
+
+def amount_columns(n_periods):
+    """The intake amount columns: 'Amount_CY', 'Amount_PY', 'Amount_PY2', ..."""
+    return [f'Amount_{key}' for key in period_keys(n_periods)]
+
+
+def periods_in_columns(columns):
+    """The number of periods of a table with `columns` (e.g. an intake DataFrame's)."""
+    columns, n_periods = set(columns), 0
+    while f'Amount_{period_key(n_periods)}' in columns:
+        n_periods += 1
+    return n_periods
+
+
+def periods_in_nested(aggregated_data):
+    """The number of periods of Agent 3's nested output (MIN_PERIODS when it is empty)."""
+    for note_data in aggregated_data.values():
+        return len(note_data.get('total', {})) or MIN_PERIODS
+    return MIN_PERIODS
+
+
+def period_end(period):
+    """
+    The balance date of a period: settings.PERIOD_END moved back `period`
+    times settings.PERIOD_MONTHS months. A month-end date stays a month end.
+    """
+    end = datetime.date.fromisoformat(PERIOD_END)
+    months = end.year * 12 + end.month - 1 - period * PERIOD_MONTHS
+    year, month = divmod(months, 12)
+    last_day = calendar.monthrange(year, month + 1)[1]
+    day = last_day if end.day == calendar.monthrange(end.year, end.month)[1] else min(end.day, last_day)
+    return datetime.date(year, month + 1, day)
+
+
+def period_label(period):
+    """The report column heading of a period, e.g. "As at March 31, 2025"."""
+    end = period_end(period)
+    return f"As at {calendar.month_name[end.month]} {end.day}, {end.year}"
+
+
+def period_short_label(period):
+    """A period in messages: the year for annual periods (e.g. "2025"), else the month and year ("Dec 2024")."""
+    end = period_end(period)
+    return str(end.year) if PERIOD_MONTHS % 12 == 0 else f"{calendar.month_abbr[end.month]} {end.year}"
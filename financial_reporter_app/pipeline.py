@@ -0,0 +1,112 @@
+# ==============================================================================
+# FILE: pipeline.py
+# Runs the five agents end to end for one uploaded trial balance.
+# ==============================================================================
+import time
+
+from .agents.agent_1_intake import intelligent_data_intake_agent
+from .agents.agent_2_ai_mapping import ai_mapping_agent
+from .agents.agent_3_aggregator import hierarchical_aggregator_agent
+from .agents.agent_4_validator import data_validation_agent
+from .agents.agent_5_reporter import report_finalizer_agent
+from .config_snapshot import get_config_snapshot
+from .mapping_store import get_mapping_store
+from .provenance import MatchProvenance
+from .result_cache import get_result_cache
+from .template_formulas import evaluate_template_totals, get_formula_graph
+from .upload_io import spooled_upload
+
+
+def warm_up():
+    """
+    Loads the compiled config (from its snapshot when there is one) and the
+    template formulas, so that later runs in this process reuse them.
+    """
+    get_formula_graph(get_config_snapshot().master_template)
+
+
+def _timed(timings, stage, func, *args, progress=None):
+    if progress:
+        progress(stage)
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[stage] = time.perf_counter() - started
+
+
+def run_pipeline(file_object, company_name, use_cache=True, report_output=None, progress=None):
+    """
+    Runs Agents 1 -> 5 on an uploaded workbook (path or file object).
+
+    An in-memory upload is spooled to a temp file once (see upload_io.py), and
+    every stage then reads it by path. When the result cache is enabled, a
+    workbook whose bytes (and the config and confirmed mappings) were seen
+    before reuses the stored intake, aggregation and validation results and
+    only re-renders the report, e.g. for a new company name.
+
+    Returns a dict with 'report', 'warnings', 'found_py_column', 'provenance'
+    (a MatchProvenance, for drilling down from note lines to source rows),
+    'cached' and 'timings' (seconds per stage), or None if intake or
+    reporting failed. 'report' is the xlsx bytes, or, when `report_output` is
+    given, whatever report_finalizer_agent returns for it (the path it wrote,
+    or a memoryview of a BytesIO).
+
+    `progress`, if given, is called with each stage name ('intake',
+    'mapping', 'aggregation', 'validation', 'report') as the stage starts.
+    """
+    with spooled_upload(file_object) as upload_path:
+        return _run_stages(upload_path, company_name, use_cache, report_output, progress)
+
+
+def run_intake_stage(upload_path, timings, progress=None):
+    """Agent 1: returns (intake_df, found_py_column); intake_df is None if the workbook could not be read."""
+    return _timed(timings, 'intake', intelligent_data_intake_agent, upload_path, progress=progress)
+
+
+def run_analysis_stages(intake_df, timings, progress=None):
+    """
+    Agents 2 -> 4 on an intake DataFrame, with confirmed mappings from the
+    mapping store. Returns (aggregated_data, provenance, totals, warnings).
+    """
+    config = get_config_snapshot()
+    mapping = _timed(timings, 'mapping', ai_mapping_agent, intake_df['Particulars'].tolist(), config.notes_structure, progress=progress)
+    aggregated_data, provenance = _timed(timings, 'aggregation', hierarchical_aggregator_agent, intake_df, mapping, get_mapping_store(), True, progress=progress)
+    totals = evaluate_template_totals(aggregated_data)
+    warnings = _timed(timings, 'validation', data_validation_agent, aggregated_data, totals, progress=progress)
+    return aggregated_data, provenance, totals, warnings
+
+
+def run_report_stage(aggregated_data, company_name, timings, report_output=None, totals=None, progress=None):
+    """Agent 5: renders the report (see report_finalizer_agent for `report_output`); None on failure."""
+    if totals is None:
+        totals = evaluate_template_totals(aggregated_data)
+    return _timed(timings, 'report', report_finalizer_agent, aggregated_data, company_name, report_output, totals, progress=progress)
+
+
+def _run_stages(upload_path, company_name, use_cache, report_output, progress=None):
+    timings = {}
+    cache = get_result_cache() if use_cache else None
+    mapping_store = get_mapping_store()
+    cache_key = cache.key_for(upload_path, mapping_store.revision() if mapping_store else None) if cache else None
+    cached = cache.get(cache_key) if cache else None
+
+    if cached:
+        print("\n--- Pipeline: Cache hit, skipping straight to the report. ---")
+        intake_df, found_py_column, aggregated_data, warnings, provenance = cached
+        if provenance is not None:
+            provenance = MatchProvenance.from_dict(get_config_snapshot().compiled, provenance)
+        totals = None
+    else:
+        intake_df, found_py_column = run_intake_stage(upload_path, timings, progress)
+        if intake_df is None:
+            return None
+        aggregated_data, provenance, totals, warnings = run_analysis_stages(intake_df, timings, progress)
+        if cache:
+            cache.put(cache_key, intake_df, found_py_column, aggregated_data, warnings, provenance.to_dict())
+
+    report = run_report_stage(aggregated_data, company_name, timings, report_output, totals, progress)
+    if report is None:
+        return None
+    return {'report': report, 'warnings': warnings, 'found_py_column': found_py_column,
+            'provenance': provenance, 'cached': bool(cached), 'timings': timings}
@@ -0,0 +1,31 @@
+# ==============================================================================
+# FILE: private_files.py
+# Ownership checks for the directories whose files are trusted when read
+# back: the config snapshot (unpickled, which runs code) and the result
+# cache (served as the result of an upload). Such a file is only used when
+# nobody but the current user can have written it.
+# ==============================================================================
+import os
+import stat
+
+
+def check_private(path, fd=None):
+    """
+    Raises PermissionError unless the directory or file at `path` (or the
+    open file `fd`, if given) is owned by the current user and is not
+    writable by its group or by others. A symlink is judged by its own owner.
+    """
+    if not hasattr(os, 'getuid'):
+        # Windows: the default locations are in the user's own profile.
+        return
+    st = os.lstat(path) if fd is None else os.fstat(fd)
+    if st.st_uid != os.getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{path} is not private to this user (owner uid {st.st_uid}, "
+                              f"mode {stat.filemode(st.st_mode)}); refusing to use it")
+
+
+def ensure_private_dir(path):
+    """Creates `path` (mode 0700) if it is missing and checks that it is private; returns `path`."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    check_private(path)
+    return path
@@ -0,0 +1,98 @@
+# ==============================================================================
+# FILE: provenance.py
+# Which source rows fed which note lines, and which rows matched nothing,
+# recorded by Agent 3 while it aggregates.
+# ==============================================================================
+import numpy as np
+
+from .periods import amount_columns
+
+
+def _indptr(ids, minlength):
+    return np.concatenate(([0], np.cumsum(np.bincount(ids, minlength=minlength)))).astype(np.int64)
+
+
+class MatchProvenance:
+    """
+    Match records of one aggregation, in two compressed (CSR) indexes:
+      - leaf -> rows: `leaf_rows[leaf_indptr[l]:leaf_indptr[l + 1]]` are the
+        positions of the rows that fed leaf `l`.
+      - row -> leaves: `row_leaves[row_indptr[r]:row_indptr[r + 1]]` are the
+        ids of the leaves that row `r` fed.
+    Rows are the unique keys Agent 3 aggregates, in order. `row_ids` holds each
+    one's index label in Agent 1's DataFrame (the last occurrence of a
+    repeated key, whose amounts are the ones used), and `row_amounts` their
+    amounts, one row per period.
+
+    Leaves are numbered in template order, so every section's leaves are one
+    contiguous range and its rows one contiguous slice of `leaf_rows`. Any
+    note line can therefore be drilled down to its rows without a scan.
+    """
+
+    def __init__(self, compiled, row_ids, particulars, row_amounts, matched_leaves, matched_rows):
+        self.compiled = compiled
+        self.row_ids = np.asarray(row_ids)
+        self.particulars = list(particulars)
+        self.row_amounts = np.asarray(row_amounts, dtype=np.float64).reshape(len(row_amounts), -1)
+        self.row_positions = {row_id: pos for pos, row_id in enumerate(self.row_ids.tolist())}
+
+        matched_leaves = np.asarray(matched_leaves, dtype=np.int64)
+        matched_rows = np.asarray(matched_rows, dtype=np.int64)
+        # Matches are produced row by row, so they are already grouped by row.
+        self.row_indptr = _indptr(matched_rows, len(self.row_ids))
+        self.row_leaves = matched_leaves
+        self.leaf_indptr = _indptr(matched_leaves, len(compiled.leaves))
+        self.leaf_rows = matched_rows[np.argsort(matched_leaves, kind='stable')]
+
+        unmatched = np.flatnonzero(np.diff(self.row_indptr) == 0)
+        self.unmatched_rows = self._table(unmatched)
+
+    def _table(self, positions):
+        import pandas as pd
+
+        return pd.DataFrame({
+            'Row': self.row_ids[positions],
+            'Particulars': [self.particulars[pos] for pos in positions.tolist()],
+            **dict(zip(amount_columns(len(self.row_amounts)), self.row_amounts[:, positions]))
+        })
+
+    def _row_positions_for(self, note_num, path):
+        compiled = self.compiled
+        if path:
+            start, end = compiled.node_leaf_range[compiled.node_ids[(note_num, tuple(path))]]
+        else:
+            start, end = compiled.note_leaf_range[compiled.note_nums.index(note_num)]
+        return self.leaf_rows[self.leaf_indptr[start]:self.leaf_indptr[end]]
+
+    def rows_for(self, note_num, path=()):
+        """
+        Index labels of the source rows behind a note (empty `path`), a section
+        or a leaf. A row that feeds two leaves of a section is listed twice.
+        """
+        return self.row_ids[self._row_positions_for(note_num, path)]
+
+    def source_rows(self, note_num, path=()):
+        """The rows behind a note line as a table of Row, Particulars and an amount column per period (Amount_CY, ...)."""
+        return self._table(self._row_positions_for(note_num, path))
+
+    def leaves_for_row(self, row_id):
+        """The (note_num, path) leaves that the source row with index label `row_id` fed."""
+        pos = self.row_positions[row_id]
+        return [self.compiled.leaves[leaf_id] for leaf_id in self.row_leaves[self.row_indptr[pos]:self.row_indptr[pos + 1]].tolist()]
+
+    def to_dict(self):
+        """A JSON-serialisable form, e.g. for the result cache."""
+        return {
+            'row_ids': self.row_ids.tolist(),
+            'particulars': self.particulars,
+            'row_amounts': self.row_amounts.tolist(),
+            'row_indptr': self.row_indptr.tolist(),
+            'row_leaves': self.row_leaves.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, compiled, data):
+        """Rebuilds a MatchProvenance from to_dict() output, for the same compiled config."""
+        row_indptr = np.asarray(data['row_indptr'], dtype=np.int64)
+        matched_rows = np.repeat(np.arange(len(row_indptr) - 1), np.diff(row_indptr))
+        return cls(compiled, data['row_ids'], data['particulars'], data['row_amounts'], data['row_leaves'], matched_rows)
@@ -0,0 +1,157 @@
+# ==============================================================================
+# FILE: result_cache.py
+# On-disk cache of pipeline results, keyed by the uploaded file's content and
+# the mapping config, so repeat uploads skip straight to the report stage.
+# ==============================================================================
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from .private_files import ensure_private_dir
+from .settings import (AI_MAPPING_MIN_SCORE, MAX_PERIODS, PERIOD_END, PERIOD_MONTHS, RESULT_CACHE_DIR,
+                       RESULT_CACHE_MAX_BYTES)
+from .upload_io import mapped_file
+
+_CHUNK_SIZE = 1 << 20
+
+# Part of every cache key. Bump when a change to any stage alters its
+# results, so entries written by an older build are never served.
+CACHE_VERSION = 1
+
+_config_fingerprint = None
+
+
+def config_fingerprint():
+    """
+    SHA-256 of CACHE_VERSION, the mapping config (config.py) and the
+    settings that change cached results (mapping, the periods read and their
+    labels in the validation warnings), computed once per process.
+    """
+    global _config_fingerprint
+    if _config_fingerprint is None:
+        from .config_snapshot import get_config_snapshot
+        config = get_config_snapshot()
+        # config.py's own hash when available; hashing its repr() is much slower.
+        basis = config.source_hash or repr((config.notes_structure, config.master_template))
+        settings = f"{AI_MAPPING_MIN_SCORE}:{MAX_PERIODS}:{PERIOD_END}:{PERIOD_MONTHS}"
+        _config_fingerprint = hashlib.sha256(f"v{CACHE_VERSION}:{basis}:{settings}".encode('utf-8')).hexdigest()
+    return _config_fingerprint
+
+
+def upload_digest(file_object):
+    """
+    SHA-256 of an upload given as a path (hashed through a memory map) or a
+    seekable file object (read in chunks).
+    """
+    digest = hashlib.sha256()
+    if isinstance(file_object, (str, os.PathLike)):
+        with mapped_file(file_object) as view:
+            digest.update(view)
+    else:
+        file_object.seek(0)
+        for chunk in iter(lambda: file_object.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+        file_object.seek(0)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Stores the intake DataFrame (as a Parquet intake table, see columnar.py),
+    the aggregated data, the validation warnings and the match provenance
+    (JSON) for each cache key in its own directory.
+    Entries are evicted least-recently-used first once the cache grows past
+    `max_bytes`; a hit refreshes the entry's modification time.
+    The cache is best-effort: an entry that cannot be read is a miss, and
+    one that cannot be written is skipped with a warning.
+    """
+
+    def __init__(self, directory, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        ensure_private_dir(directory)
+
+    def key_for(self, file_object, *extra):
+        """Cache key of an upload under the current config; `extra` adds other inputs (e.g. a store revision)."""
+        parts = [upload_digest(file_object), config_fingerprint()] + [str(part) for part in extra]
+        return hashlib.sha256(':'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Returns (intake_df, found_py_column, aggregated_data, warnings,
+        provenance), or None on a miss. `provenance` is MatchProvenance.to_dict()
+        output, or None if none was stored.
+        """
+        from .columnar import read_intake
+
+        entry = os.path.join(self.directory, key)
+        try:
+            with open(os.path.join(entry, 'result.json'), encoding='utf-8') as f:
+                result = json.load(f)
+            intake_df, _ = read_intake(os.path.join(entry, 'intake.parquet'))
+            now = time.time()
+            os.utime(entry, (now, now))
+        except (OSError, ValueError, KeyError):
+            return None
+        return intake_df, result['found_py_column'], result['aggregated_data'], result['warnings'], result.get('provenance')
+
+    def put(self, key, intake_df, found_py_column, aggregated_data, warnings, provenance=None):
+        from .columnar import write_intake
+
+        # Write into a scratch directory and rename it into place, so readers
+        # never see a half-written entry.
+        scratch = None
+        try:
+            scratch = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+            write_intake(os.path.join(scratch, 'intake.parquet'), intake_df, found_py_column)
+            with open(os.path.join(scratch, 'result.json'), 'w', encoding='utf-8') as f:
+                json.dump({'found_py_column': found_py_column, 'aggregated_data': aggregated_data, 'warnings': warnings,
+                           'provenance': provenance}, f)
+            entry = os.path.join(self.directory, key)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(scratch, entry)
+            self.evict()
+        except Exception as e:
+            if scratch:
+                shutil.rmtree(scratch, ignore_errors=True)
+            print(f"⚠️  Result not cached ({type(e).__name__}: {e}).")
+
+    def evict(self):
+        """Removes least-recently-used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.tmp-') or not os.path.isdir(path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+_default_cache = None
+
+
+def get_result_cache():
+    """
+    Returns the process-wide cache at settings.RESULT_CACHE_DIR, or None if
+    caching is disabled or the directory cannot be used (reported once).
+    """
+    global _default_cache
+    if not RESULT_CACHE_DIR:
+        return None
+    if _default_cache is None:
+        try:
+            _default_cache = ResultCache(RESULT_CACHE_DIR)
+        except OSError as e:
+            print(f"⚠️  Result cache disabled ({e}); runs go on without it.")
+            _default_cache = False
+    return _default_cache or None
@@ -0,0 +1,389 @@
+# ==============================================================================
+# FILE: service.py
+# A local HTTP service for report generation. Uploads are accepted as jobs,
+# queued, and run in a pool of worker processes, so a slow workbook never
+# blocks the server or other users' uploads.
+#
+# Usage (from the repository root):
+#   python -m financial_reporter_app.service --port 8765 --workers 4
+#
+#   curl --data-binary @tb.xlsx "http://127.0.0.1:8765/jobs?company=Acme%20Ltd&filename=tb.xlsx"
+#   curl http://127.0.0.1:8765/jobs/<id>
+#   curl -o report.xlsx http://127.0.0.1:8765/jobs/<id>/report
+# ==============================================================================
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from .pipeline import run_pipeline, warm_up
+from .settings import (SERVICE_HOST, SERVICE_JOB_DIR, SERVICE_JOB_TTL, SERVICE_MAX_UPLOAD_BYTES, SERVICE_PORT,
+                       SERVICE_QUEUE_SIZE, SERVICE_WORKERS)
+
+STAGES = ['intake', 'mapping', 'aggregation', 'validation', 'report']
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CHUNK_SIZE = 1024 * 1024
+RETRY_AFTER_S = 5
+
+REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+
+def run_job(job_dir, upload_path, company_name):
+    """
+    Runs the pipeline for one job inside a worker process. The report is
+    rendered to job_dir/report.xlsx, and the stage in progress is written to
+    job_dir/stage so the server can report progress. Returns a JSON-able
+    summary; raises RuntimeError if the pipeline could not produce a report.
+    """
+    def progress(stage):
+        scratch = os.path.join(job_dir, 'stage.part')
+        with open(scratch, 'w', encoding='utf-8') as f:
+            f.write(stage)
+        os.replace(scratch, os.path.join(job_dir, 'stage'))
+
+    report_path = os.path.join(job_dir, 'report.xlsx')
+    scratch_path = report_path + '.part'
+    result = run_pipeline(upload_path, company_name, report_output=scratch_path, progress=progress)
+    if result is None:
+        if os.path.exists(scratch_path):
+            os.remove(scratch_path)
+        raise RuntimeError("The workbook could not be read or the report could not be rendered.")
+    os.replace(scratch_path, report_path)
+    return {
+        'warnings': result['warnings'],
+        'found_py_column': result['found_py_column'],
+        'unmatched_rows': len(result['provenance'].unmatched_rows) if result['provenance'] is not None else None,
+        'cached': result['cached'],
+        'timings': {stage: round(seconds, 4) for stage, seconds in result['timings'].items()}
+    }
+
+
+class Job:
+    """One upload and its report: status is 'queued', 'running', 'done' or 'failed'."""
+
+    def __init__(self, job_id, job_dir, upload_path, company_name):
+        self.id = job_id
+        self.dir = job_dir
+        self.upload_path = upload_path
+        self.company_name = company_name
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.summary = None
+        self.error = None
+
+    @property
+    def report_path(self):
+        return os.path.join(self.dir, 'report.xlsx')
+
+    def stage(self):
+        """The stage the worker is in, as last written by run_job, or None."""
+        if self.status != 'running':
+            return None
+        try:
+            with open(os.path.join(self.dir, 'stage'), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def to_dict(self, queue_position=None):
+        stage = self.stage()
+        if self.status == 'done':
+            progress = 1.0
+        elif stage in STAGES:
+            progress = round(STAGES.index(stage) / len(STAGES), 2)
+        else:
+            progress = 0.0
+        data = {'id': self.id, 'status': self.status, 'company': self.company_name, 'stage': stage,
+                'progress': progress, 'queue_position': queue_position, 'created_at': self.created_at,
+                'started_at': self.started_at, 'finished_at': self.finished_at, 'error': self.error,
+                'report_url': f"/jobs/{self.id}/report" if self.status == 'done' else None}
+        if self.summary:
+            data.update(self.summary)
+        return data
+
+
+class ReportService:
+    """
+    The asyncio server. Accepted uploads are streamed to disk and put on a
+    bounded queue; `workers` dispatcher tasks each hand one job at a time to
+    the process pool, so at most `workers` pipelines run at once. When the
+    queue is full, new uploads are refused with 503 and Retry-After before
+    their body is read. Jobs live in memory and finished ones are removed
+    after `job_ttl` seconds.
+    """
+
+    def __init__(self, workers=SERVICE_WORKERS, queue_size=SERVICE_QUEUE_SIZE, job_dir=SERVICE_JOB_DIR,
+                 max_upload_bytes=SERVICE_MAX_UPLOAD_BYTES, job_ttl=SERVICE_JOB_TTL):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.job_dir = job_dir
+        self.max_upload_bytes = max_upload_bytes
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self.port = None
+        self._queue = None
+        self._pool = None
+        self._server = None
+        self._tasks = []
+        self._root = None
+        self._closing = False
+
+    async def start(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        """Starts the worker pool and the server; port 0 picks a free port (see `self.port`)."""
+        os.makedirs(self.job_dir, exist_ok=True)
+        self._root = tempfile.mkdtemp(dir=self.job_dir, prefix='service-')
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+        self._tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._expire_jobs()))
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"✅ Service READY on http://{host}:{self.port} ({self.workers} workers, queue of {self.queue_size}).")
+
+    async def close(self):
+        """Stops accepting uploads, cancels queued jobs and shuts the pool down."""
+        self._closing = True
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        if self._root:
+            shutil.rmtree(self._root, ignore_errors=True)
+
+    # --- Jobs ---------------------------------------------------------------
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            job.status, job.started_at = 'running', time.time()
+            pool = self._pool
+            try:
+                job.summary = await loop.run_in_executor(pool, run_job, job.dir, job.upload_path, job.company_name)
+                job.status = 'done'
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); the pool is unusable
+                # from here on, so replace it for the jobs that follow. Every
+                # dispatcher with a job on it lands here; only the first one
+                # replaces it, so a newer pool is never shut down.
+                job.status, job.error = 'failed', "The worker process running this job exited unexpectedly."
+                if self._pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+            except asyncio.CancelledError:
+                if self._closing:
+                    raise
+                # The job's future was cancelled (its pool was shut down) while
+                # the service keeps running: fail the job, keep dispatching.
+                job.status, job.error = 'failed', "The job was cancelled when its worker pool was replaced."
+            except Exception as e:
+                job.status, job.error = 'failed', str(e) or type(e).__name__
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    async def _expire_jobs(self):
+        while True:
+            await asyncio.sleep(min(60, max(1, self.job_ttl)))
+            cutoff = time.time() - self.job_ttl
+            for job in [job for job in self.jobs.values() if job.finished_at and job.finished_at < cutoff]:
+                del self.jobs[job.id]
+                shutil.rmtree(job.dir, ignore_errors=True)
+
+    def _queue_position(self, job):
+        if job.status != 'queued':
+            return None
+        return sum(1 for other in self.jobs.values() if other.status == 'queued' and other.created_at < job.created_at)
+
+    # --- HTTP ---------------------------------------------------------------
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            request_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+            try:
+                method, target, _ = request_line.split(' ', 2)
+            except ValueError:
+                await _send_json(writer, 400, {'error': "Malformed request line."})
+                return
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            url = urlsplit(target)
+            parts = [unquote(part) for part in url.path.split('/') if part]
+            await self._route(method.upper(), parts, parse_qs(url.query), headers, reader, writer)
+        except ConnectionError:
+            pass
+        except Exception as e:
+            with contextlib.suppress(ConnectionError):
+                await _send_json(writer, 500, {'error': str(e) or type(e).__name__})
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _route(self, method, parts, query, headers, reader, writer):
+        if parts == ['health']:
+            if method != 'GET':
+                return await _send_json(writer, 405, {'error': "Use GET."})
+            counts = {status: 0 for status in ('queued', 'running', 'done', 'failed')}
+            for job in self.jobs.values():
+                counts[job.status] += 1
+            return await _send_json(writer, 200, {'status': 'ok', 'workers': self.workers,
+                                                  'queue_size': self.queue_size, 'jobs': counts})
+        if parts == ['jobs']:
+            if method == 'POST':
+                return await self._create_job(query, headers, reader, writer)
+            if method == 'GET':
+                jobs = [job.to_dict(self._queue_position(job)) for job in self.jobs.values()]
+                return await _send_json(writer, 200, {'jobs': jobs})
+            return await _send_json(writer, 405, {'error': "Use GET or POST."})
+        if len(parts) in (2, 3) and parts[0] == 'jobs':
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return await _send_json(writer, 404, {'error': f"No job {parts[1]!r}."})
+            if method != 'GET':
+                return await _send_json(writer, 405, {'error': "Use GET."})
+            if len(parts) == 2:
+                return await _send_json(writer, 200, job.to_dict(self._queue_position(job)))
+            if parts[2] == 'report':
+                if job.status != 'done':
+                    return await _send_json(writer, 409, {'error': f"The job is {job.status}; no report yet.", 'status': job.status})
+                filename = f"{job.company_name} - Financial Statements.xlsx"
+                return await _send_file(writer, job.report_path, XLSX_CONTENT_TYPE, filename)
+        return await _send_json(writer, 404, {'error': "Not found."})
+
+    async def _create_job(self, query, headers, reader, writer):
+        company_name = (query.get('company') or [''])[0].strip()
+        if not company_name:
+            return await _send_json(writer, 400, {'error': "The 'company' query parameter is required."})
+        # The name ends up in the report's download filename (and its header).
+        if not company_name.isprintable() or '/' in company_name or '\\' in company_name:
+            return await _send_json(writer, 400, {'error': "The company name may not contain control characters, '/' or '\\'."})
+        if 'chunked' in headers.get('transfer-encoding', '').lower() or not headers.get('content-length', '').isdigit():
+            return await _send_json(writer, 411, {'error': "Send the workbook as the request body with a Content-Length."})
+        length = int(headers['content-length'])
+        if length == 0:
+            return await _send_json(writer, 400, {'error': "The request body is empty."})
+        if length > self.max_upload_bytes:
+            return await _send_json(writer, 413, {'error': f"Uploads are limited to {self.max_upload_bytes} bytes."})
+        if self._queue.full():
+            return await _send_json(writer, 503, {'error': "The job queue is full; retry later."},
+                                    {'Retry-After': str(RETRY_AFTER_S)})
+        if headers.get('expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            await writer.drain()
+
+        # Keep the upload's extension, so intake can tell the file type by name.
+        extension = os.path.splitext((query.get('filename') or [''])[0])[1].lower() or '.xlsx'
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self._root, job_id)
+        os.makedirs(job_dir)
+        upload_path = os.path.join(job_dir, f"upload{extension}")
+        try:
+            with open(upload_path, 'wb') as f:
+                remaining = length
+                while remaining:
+                    chunk = await reader.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise ConnectionError("The upload ended early.")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            job = Job(job_id, job_dir, upload_path, company_name)
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            return await _send_json(writer, 503, {'error': "The job queue is full; retry later."},
+                                    {'Retry-After': str(RETRY_AFTER_S)})
+        except BaseException:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        self.jobs[job_id] = job
+        return await _send_json(writer, 202, job.to_dict(self._queue_position(job)),
+                                {'Location': f"/jobs/{job_id}"})
+
+
+def _head(status, headers):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"] + [f"{name}: {value}" for name, value in headers.items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def _send_json(writer, status, payload, extra_headers=None):
+    body = json.dumps(payload).encode('utf-8')
+    headers = {'Content-Type': 'application/json', 'Content-Length': len(body), 'Connection': 'close'}
+    headers.update(extra_headers or {})
+    writer.write(_head(status, headers) + body)
+    await writer.drain()
+
+
+def _content_disposition(filename):
+    """An attachment header: a plain ASCII `filename` for old clients and the exact name as RFC 5987 `filename*`."""
+    fallback = ''.join(c if ' ' <= c <= '~' and c not in '"\\/' else '_' for c in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+async def _send_file(writer, path, content_type, filename):
+    # Streamed in chunks, so a large report is never held in memory whole.
+    headers = {'Content-Type': content_type, 'Content-Length': os.path.getsize(path), 'Connection': 'close',
+               'Content-Disposition': _content_disposition(filename)}
+    writer.write(_head(200, headers))
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            writer.write(chunk)
+            await writer.drain()
+
+
+async def _serve(args):
+    service = ReportService(args.workers, args.queue_size)
+    await service.start(args.host, args.port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        # Not available on Windows, where Ctrl+C still raises KeyboardInterrupt.
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(signum, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await service.close()
+    print("\n--- Service: Stopped. ---")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the local report service.")
+    parser.add_argument('--host', default=SERVICE_HOST, help=f"Address to listen on (default: {SERVICE_HOST}).")
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help=f"Port to listen on (default: {SERVICE_PORT}).")
+    parser.add_argument('-w', '--workers', type=int, default=SERVICE_WORKERS, help=f"Pipeline worker processes (default: {SERVICE_WORKERS}).")
+    parser.add_argument('--queue-size', type=int, default=SERVICE_QUEUE_SIZE, help=f"Jobs that may wait for a worker (default: {SERVICE_QUEUE_SIZE}).")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# ==============================================================================
+# FILE: settings.py
+# Runtime settings for the pipeline. Each one can be overridden with an
+# environment variable so deployments can be sized without code changes.
+# ==============================================================================
+import os
+import tempfile
+
+def _env_int(name, default):
+    value = os.environ.get(name, '').strip()
+    return int(value) if value else default
+
+def _user_cache_dir(name):
+    # Per-user, not the shared temp directory: files here are trusted when read back.
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'financial_reporter', name)
+
+# Number of worker processes used to parse workbook sheets in parallel.
+# 0 or 1 keeps the sequential, in-process intake.
+INTAKE_WORKERS = _env_int('FINREPORT_INTAKE_WORKERS', 0)
+
+# Reporting periods. Intake reads up to FINREPORT_MAX_PERIODS amount columns
+# to the right of each Particulars column: the current period, then each
+# comparative period further back (e.g. 5 for five-year comparatives, 4 for
+# the quarters of a year). Reports label period p with the balance date
+# FINREPORT_PERIOD_END (YYYY-MM-DD) moved back p * FINREPORT_PERIOD_MONTHS months.
+MAX_PERIODS = max(1, _env_int('FINREPORT_MAX_PERIODS', 2))
+PERIOD_END = os.environ.get('FINREPORT_PERIOD_END', '2025-03-31').strip() or '2025-03-31'
+PERIOD_MONTHS = max(1, _env_int('FINREPORT_PERIOD_MONTHS', 12))
+
+# Spreadsheet reader backend (see spreadsheet_readers.py): "auto" tries the
+# fastest installed reader for the upload's format first, falling back to
+# the next; a backend name (e.g. "openpyxl") forces that reader.
+INTAKE_READER = os.environ.get('FINREPORT_INTAKE_READER', 'auto').strip() or 'auto'
+
+# Directory of the content-hash result cache (see result_cache.py). It must
+# be owned by and writable only by the current user, or caching is turned
+# off. Set FINREPORT_CACHE_DIR to an empty string to disable caching.
+RESULT_CACHE_DIR = os.environ.get('FINREPORT_CACHE_DIR', _user_cache_dir('results'))
+
+# Size bound of the result cache; least-recently-used entries are evicted past it.
+RESULT_CACHE_MAX_BYTES = _env_int('FINREPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+
+# Where per-stage instrumentation records go (see instrumentation.py): empty
+# disables instrumentation, "-" writes JSON lines to stderr, anything else is
+# a file path to append them to.
+METRICS_OUTPUT = os.environ.get('FINREPORT_METRICS', '').strip()
+
+# Minimum cosine similarity (0-1) for Agent 2 to map an unknown particular to
+# the closest config alias.
+AI_MAPPING_MIN_SCORE = float(os.environ.get('FINREPORT_AI_MAPPING_MIN_SCORE', '0.8'))
+
+# SQLite file of reviewer-confirmed particular -> note mappings (see
+# mapping_store.py). Set FINREPORT_MAPPING_STORE to an empty string to disable it.
+MAPPING_STORE_PATH = os.environ.get('FINREPORT_MAPPING_STORE', os.path.join(os.path.expanduser('~'), '.financial_reporter', 'mappings.sqlite3'))
+
+# Number of particulars (hits and misses) kept in the mapping store's in-process LRU.
+MAPPING_STORE_CACHE_SIZE = _env_int('FINREPORT_MAPPING_STORE_CACHE_SIZE', 100_000)
+
+# Directory where in-memory uploads are spooled to disk before intake (see
+# upload_io.py). Unset uses the system temp directory.
+SPOOL_DIR = os.environ.get('FINREPORT_SPOOL_DIR') or None
+
+# Directory of the compiled config snapshot (see config_snapshot.py). It must
+# be owned by and writable only by the current user, or the snapshot is not
+# loaded. Set FINREPORT_CONFIG_SNAPSHOT_DIR to an empty string to always
+# compile config.py.
+CONFIG_SNAPSHOT_DIR = os.environ.get('FINREPORT_CONFIG_SNAPSHOT_DIR', _user_cache_dir('snapshot'))
+
+# Local report service (see service.py): the address it listens on, the
+# number of pipeline worker processes, how many accepted jobs may wait for a
+# worker before uploads are refused with 503, the largest accepted upload,
+# where uploads and reports are kept, and how long finished jobs are kept.
+SERVICE_HOST = os.environ.get('FINREPORT_SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = _env_int('FINREPORT_SERVICE_PORT', 8765)
+SERVICE_WORKERS = _env_int('FINREPORT_SERVICE_WORKERS', 2)
+SERVICE_QUEUE_SIZE = _env_int('FINREPORT_SERVICE_QUEUE_SIZE', 16)
+SERVICE_MAX_UPLOAD_BYTES = _env_int('FINREPORT_SERVICE_MAX_UPLOAD_BYTES', 200 * 1024 * 1024)
+SERVICE_JOB_DIR = os.environ.get('FINREPORT_SERVICE_JOB_DIR', os.path.join(tempfile.gettempdir(), 'financial_reporter_jobs'))
+SERVICE_JOB_TTL = _env_int('FINREPORT_SERVICE_JOB_TTL', 3600)
+
+# Durable job queue (see job_queue.py and job_worker.py): the SQLite file of
+# jobs, the directory of uploads, stage checkpoints and reports, how long a
+# worker's claim on a job lasts without a heartbeat, how many times a job is
+# tried, and the first retry delay (doubled on each further retry).
+JOB_QUEUE_PATH = os.environ.get('FINREPORT_JOB_QUEUE', os.path.join(os.path.expanduser('~'), '.financial_reporter', 'jobs.sqlite3'))
+JOB_STORE_DIR = os.environ.get('FINREPORT_JOB_STORE_DIR', os.path.join(os.path.expanduser('~'), '.financial_reporter', 'jobs'))
+JOB_LEASE_SECONDS = _env_int('FINREPORT_JOB_LEASE_SECONDS', 120)
+JOB_MAX_ATTEMPTS = _env_int('FINREPORT_JOB_MAX_ATTEMPTS', 3)
+JOB_RETRY_BACKOFF_SECONDS = _env_int('FINREPORT_JOB_RETRY_BACKOFF_SECONDS', 10)
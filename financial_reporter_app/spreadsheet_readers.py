@@ -0,0 +1,155 @@
+# ==============================================================================
+# FILE: spreadsheet_readers.py
+# Reader backends for spreadsheet uploads. An upload's format is detected from
+# its leading bytes rather than its name, and each format has a chain of
+# pandas engines, fastest first: calamine (Rust) where installed, then the
+# pure-Python reader for that format. Backends that are not installed are
+# skipped; see requirements-optional.txt.
+#
+# Usage (from the repository root), to see how an upload would be read:
+#   python -m financial_reporter_app.spreadsheet_readers upload.xlsx
+# ==============================================================================
+import importlib.util
+import os
+import sys
+import zipfile
+
+from .settings import INTAKE_READER
+
+# Backend (pandas engine) -> the module that must be importable for it.
+BACKEND_MODULES = {
+    'calamine': 'python_calamine',
+    'openpyxl': 'openpyxl',
+    'pyxlsb': 'pyxlsb',
+    'xlrd': 'xlrd',
+    'odf': 'odf',
+}
+
+# Format -> its backends, in the order they are tried.
+FORMAT_BACKENDS = {
+    'xlsx': ('calamine', 'openpyxl'),
+    'xlsb': ('calamine', 'pyxlsb'),
+    'xls': ('calamine', 'xlrd'),
+    'ods': ('calamine', 'odf'),
+}
+
+# Used when the leading bytes match no format (e.g. a truncated file), so
+# the error comes from the reader the extension asks for.
+FORMAT_EXTENSIONS = {
+    '.xlsx': 'xlsx', '.xlsm': 'xlsx', '.xltx': 'xlsx', '.xltm': 'xlsx',
+    '.xlsb': 'xlsb', '.xls': 'xls', '.ods': 'ods',
+}
+
+_OLE2_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' # Legacy .xls (BIFF in an OLE2 container)
+_ZIP_MAGIC = b'PK\x03\x04' # .xlsx, .xlsm, .xlsb and .ods
+_ODS_MIMETYPE = b'application/vnd.oasis.opendocument.spreadsheet'
+
+
+def upload_name(file_object):
+    """The upload's file name: the path itself, or a file object's `name` ('' if it has none)."""
+    name = file_object if isinstance(file_object, (str, os.PathLike)) else getattr(file_object, 'name', None)
+    return os.fspath(name) if isinstance(name, (str, os.PathLike)) else ''
+
+
+def read_head(file_object, size):
+    """The first `size` bytes of a path or file object, leaving the file object rewound."""
+    if isinstance(file_object, (str, os.PathLike)):
+        with open(file_object, 'rb') as f:
+            return f.read(size)
+    file_object.seek(0)
+    head = file_object.read(size)
+    file_object.seek(0)
+    return head
+
+
+def _zip_format(file_object, head):
+    # ODF puts an uncompressed 'mimetype' entry first, so its type is in the
+    # leading bytes; Office Open XML formats differ by their workbook part.
+    if head[30:38] == b'mimetype' and head[38:38 + len(_ODS_MIMETYPE)] == _ODS_MIMETYPE:
+        return 'ods'
+    try:
+        with zipfile.ZipFile(file_object) as archive:
+            names = set(archive.namelist())
+    except (zipfile.BadZipFile, OSError):
+        return None
+    finally:
+        if not isinstance(file_object, (str, os.PathLike)):
+            file_object.seek(0)
+    if 'xl/workbook.bin' in names:
+        return 'xlsb'
+    if 'xl/workbook.xml' in names:
+        return 'xlsx'
+    if 'content.xml' in names:
+        return 'ods'
+    return None
+
+
+def detect_format(file_object):
+    """
+    The spreadsheet format of an upload from its content: 'xlsx', 'xlsb',
+    'xls' or 'ods', or None if it is not a spreadsheet (e.g. a CSV export).
+    """
+    head = read_head(file_object, 128)
+    if head.startswith(_OLE2_MAGIC):
+        return 'xls'
+    if head.startswith(_ZIP_MAGIC):
+        return _zip_format(file_object, head)
+    return None
+
+
+def is_installed(backend):
+    return importlib.util.find_spec(BACKEND_MODULES[backend]) is not None
+
+
+def backend_chain(file_object, backend=None):
+    """
+    The installed backends to try for an upload, in order. `backend`
+    (default: settings.INTAKE_READER) names one to force, e.g. 'openpyxl';
+    'auto' picks the chain of the detected format, falling back to the
+    extension and then to .xlsx.
+    """
+    backend = backend or INTAKE_READER
+    if backend != 'auto':
+        if backend not in BACKEND_MODULES:
+            raise ValueError(f"Unknown spreadsheet reader {backend!r}; choose from auto, {', '.join(BACKEND_MODULES)}.")
+        return [backend]
+    file_format = (detect_format(file_object)
+                   or FORMAT_EXTENSIONS.get(os.path.splitext(upload_name(file_object))[1].lower(), 'xlsx'))
+    chain = [name for name in FORMAT_BACKENDS[file_format] if is_installed(name)]
+    # Nothing installed reads it: let the last reader raise its own ImportError.
+    return chain or [FORMAT_BACKENDS[file_format][-1]]
+
+
+def read_with_fallback(file_object, read, backend=None):
+    """
+    Calls read(file_object, backend) with each backend of backend_chain() in
+    turn until one succeeds, and returns (its result, the backend used). A
+    backend that fails (e.g. calamine on a workbook it cannot parse) is
+    reported and the next one is tried; the last backend's error is raised.
+    """
+    chain = backend_chain(file_object, backend)
+    for position, name in enumerate(chain):
+        if not isinstance(file_object, (str, os.PathLike)):
+            file_object.seek(0)
+        try:
+            return read(file_object, name), name
+        except Exception as e:
+            if position == len(chain) - 1:
+                raise
+            print(f"⚠️  Reader '{name}' failed ({type(e).__name__}: {e}); trying '{chain[position + 1]}'.")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python -m financial_reporter_app.spreadsheet_readers <upload> [<upload> ...]")
+        return 2
+    installed = [name for name in BACKEND_MODULES if is_installed(name)]
+    print(f"Installed readers: {', '.join(installed) or 'none'}")
+    for path in argv:
+        print(f"{path}: format={detect_format(path) or 'unknown'}, readers={' -> '.join(backend_chain(path))}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
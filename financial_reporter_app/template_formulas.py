@@ -0,0 +1,183 @@
+# ==============================================================================
+# FILE: template_formulas.py
+# The computed totals of MASTER_TEMPLATE (section totals, PBT, PAT and the
+# balance-sheet groups the validator checks) as named formulas, compiled once
+# into a dependency DAG and evaluated once per run for Agents 4 and 5. Each
+# formula is evaluated for all periods at once, as an array of one amount
+# per period.
+# ==============================================================================
+import re
+
+import numpy as np
+
+from .periods import period_keys, periods_in_nested
+
+# Formulas are sums and differences of note totals, written "[21]", and of
+# other formulas, referenced by name.
+TEMPLATE_FORMULAS = {
+    'total_revenue': '[21] + [22]',
+    'total_expenses': '[23] + [24] + [25] + [11] + [26]',
+    'PBT': 'total_revenue - total_expenses',
+    'PAT': 'PBT - [4]',
+    'deferred_tax': '[4]',
+}
+
+# The balance-sheet groups Agent 4 reconciles, picked from the Balance Sheet
+# template by label: exact labels for equity, label substrings for the rest.
+EQUITY_LABELS = ["Share Capital", "Reserves and surplus"]
+LIABILITY_LABEL_PARTS = ["borrowings", "payables", "provisions", "Other Long - term liabilities"]
+ASSET_LABEL_PARTS = ["Fixed assets", "investments", "loans and advances", "Other non-current assets", "Inventories", "receivables", "Cash and cash equivalents", "Other current assets"]
+
+_TERM = re.compile(r'\s*([+-])?\s*(?:\[([^\]]+)\]|([A-Za-z_]\w*))\s*')
+
+
+def parse_formula(expression):
+    """Parses "a + [4] - b" into a list of (sign, kind, ref) terms, kind being 'note' or 'formula'."""
+    terms, pos = [], 0
+    while pos < len(expression):
+        match = _TERM.match(expression, pos)
+        if not match or match.end() == pos or (terms and not match.group(1)):
+            raise ValueError(f"Invalid formula: {expression!r}")
+        sign = -1 if match.group(1) == '-' else 1
+        terms.append((sign, 'note', match.group(2).strip()) if match.group(2) else (sign, 'formula', match.group(3)))
+        pos = match.end()
+    if not terms:
+        raise ValueError(f"Empty formula: {expression!r}")
+    return terms
+
+
+def _sum_of_notes(notes):
+    return ' + '.join(f"[{note}]" for note in notes)
+
+
+class FormulaGraph:
+    """
+    Named formulas compiled into a DAG. `order` lists the names so that every
+    formula comes after the formulas it uses; evaluate() walks it once, so
+    each formula is computed exactly once per call. Cycles and references to
+    unknown formulas are rejected when the graph is built.
+
+    `row_formulas` maps a template row, as (sheet name, row index), to the
+    formula that computes it. Total rows whose note list matches an existing
+    formula share that formula instead of getting a copy.
+    """
+
+    def __init__(self, formulas, row_formulas=None):
+        self.terms = {name: parse_formula(expression) for name, expression in formulas.items()}
+        self.row_formulas = dict(row_formulas or {})
+
+        self.order, state = [], {}
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Formula cycle: {' -> '.join(path + (name,))}")
+            if name not in self.terms:
+                raise ValueError(f"Unknown formula {name!r} used by {path[-1]!r}")
+            state[name] = 'visiting'
+            for _, kind, ref in self.terms[name]:
+                if kind == 'formula':
+                    visit(ref, path + (name,))
+            state[name] = 'done'
+            self.order.append(name)
+
+        for name in self.terms:
+            visit(name, ())
+
+    def evaluate(self, aggregated_data, n_periods=None):
+        """
+        Returns TemplateTotals holding every formula's value for each of the
+        first `n_periods` periods (default: all periods of `aggregated_data`).
+        """
+        keys = period_keys(periods_in_nested(aggregated_data) if n_periods is None else n_periods)
+        note_totals = {}
+        values = {}
+        for name in self.order:
+            total = np.zeros(len(keys))
+            for sign, kind, ref in self.terms[name]:
+                if kind == 'note':
+                    if ref not in note_totals:
+                        note_total = aggregated_data.get(ref, {}).get('total', {})
+                        note_totals[ref] = np.array([note_total.get(key, 0) for key in keys], dtype=np.float64)
+                    value = note_totals[ref]
+                else:
+                    value = values[ref]
+                total = total + value if sign > 0 else total - value
+            values[name] = total
+        return TemplateTotals(values, self.row_formulas, keys)
+
+
+class TemplateTotals:
+    """
+    The evaluated formulas of one run: `values[name]` is an array with one
+    amount per period, in the order of `periods` (the period keys).
+    """
+
+    def __init__(self, values, row_formulas, periods):
+        self.values = values
+        self.row_formulas = row_formulas
+        self.periods = list(periods)
+
+    def get(self, name, period=None):
+        """A formula's value for one period (a key such as 'CY'), or its array of all periods."""
+        value = self.values[name]
+        return value if period is None else float(value[self.periods.index(period)])
+
+    def for_row(self, sheet_name, row_index, period=None):
+        """The value of a template total row (all periods, or one), or 0 if the row has no formula."""
+        name = self.row_formulas.get((sheet_name, row_index))
+        if name is None:
+            return np.zeros(len(self.periods)) if period is None else 0
+        return self.get(name, period)
+
+
+def build_template_formulas(template):
+    """
+    Collects the named formulas plus one formula per "total" row of
+    `template`: a row with a list of notes sums them, and a row whose note is
+    a formula name (e.g. 'PBT') uses that formula.
+    """
+    bs_template = template['Balance Sheet']
+    formulas = dict(TEMPLATE_FORMULAS)
+    formulas['equity'] = _sum_of_notes(row[2] for row in bs_template if row[2] and row[1] in EQUITY_LABELS)
+    formulas['liabilities'] = _sum_of_notes(row[2] for row in bs_template if row[2] and any(x in row[1] for x in LIABILITY_LABEL_PARTS))
+    formulas['assets'] = _sum_of_notes(row[2] for row in bs_template if row[2] and any(x in row[1] for x in ASSET_LABEL_PARTS))
+
+    by_expression = {expression: name for name, expression in formulas.items()}
+    row_formulas = {}
+    for sheet_name, rows in template.items():
+        for row_index, (_, _, note, row_type) in enumerate(rows):
+            if row_type != 'total':
+                continue
+            if isinstance(note, list):
+                expression = _sum_of_notes(note)
+                name = by_expression.get(expression)
+                if name is None:
+                    name = by_expression[expression] = f"{sheet_name} row {row_index}"
+                    formulas[name] = expression
+                row_formulas[(sheet_name, row_index)] = name
+            elif note in formulas:
+                row_formulas[(sheet_name, row_index)] = note
+    return formulas, row_formulas
+
+
+# The graph for the most recently used template; it is normally MASTER_TEMPLATE.
+_last_graph = None
+_last_template = None
+
+
+def get_formula_graph(template=None):
+    """Returns the compiled FormulaGraph for `template` (default: MASTER_TEMPLATE), building it on first use."""
+    global _last_graph, _last_template
+    if template is None:
+        from .config_snapshot import get_config_snapshot
+        template = get_config_snapshot().master_template
+    if _last_graph is None or _last_template is not template:
+        _last_graph = FormulaGraph(*build_template_formulas(template))
+        _last_template = template
+    return _last_graph
+
+
+def evaluate_template_totals(aggregated_data, template=None):
+    """Evaluates every template formula for one run's aggregated data."""
+    return get_formula_graph(template).evaluate(aggregated_data)
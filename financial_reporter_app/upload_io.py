@@ -0,0 +1,80 @@
+# ==============================================================================
+# FILE: upload_io.py
+# Gets uploads onto disk once, so that every stage (hashing, intake, sheet
+# workers) reads them by path or memory map instead of holding byte copies.
+# ==============================================================================
+import contextlib
+import io
+import mmap
+import os
+import shutil
+import tempfile
+
+from .settings import SPOOL_DIR
+
+_CHUNK_SIZE = 1 << 20
+
+
+def _backing_path(file_object):
+    """The path of the regular file behind a file object, or None (e.g. for a BytesIO)."""
+    name = getattr(file_object, 'name', None)
+    if not isinstance(name, (str, os.PathLike)):
+        return None
+    try:
+        if os.path.samestat(os.fstat(file_object.fileno()), os.stat(name)):
+            return name
+    except (OSError, ValueError, io.UnsupportedOperation):
+        pass
+    return None
+
+
+@contextlib.contextmanager
+def spooled_upload(file_object):
+    """
+    Yields a filesystem path for an upload given as a path or a binary file
+    object. Paths, and file objects opened on a regular file, are used as-is.
+    Anything else (a BytesIO, a web framework's in-memory upload) is copied
+    once to a temp file in settings.SPOOL_DIR, which is removed afterwards.
+    """
+    if isinstance(file_object, (str, os.PathLike)):
+        yield file_object
+        return
+    path = _backing_path(file_object)
+    if path is not None:
+        yield path
+        return
+
+    # Keep the upload's extension (e.g. .csv), which intake goes by.
+    name = getattr(file_object, 'name', None)
+    suffix = os.path.splitext(name)[1].lower() if isinstance(name, str) else ''
+    fd, path = tempfile.mkstemp(suffix=suffix or '.xlsx', prefix='upload-', dir=SPOOL_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            if isinstance(file_object, io.BytesIO):
+                # Write straight from the BytesIO's buffer, without a getvalue() copy.
+                spool.write(file_object.getbuffer())
+            else:
+                file_object.seek(0)
+                shutil.copyfileobj(file_object, spool, _CHUNK_SIZE)
+        yield path
+    finally:
+        os.remove(path)
+
+
+@contextlib.contextmanager
+def mapped_file(path):
+    """
+    Yields a read-only memoryview of a file's bytes, backed by mmap so the
+    pages are shared with the OS cache instead of copied. Empty files (which
+    cannot be mapped) yield an empty memoryview.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield memoryview(b'')
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()